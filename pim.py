@@ -1,19 +1,22 @@
-import whisper
-from gtts import gTTS
-import uuid
-import subprocess
-import sounddevice as sd
-import soundfile as sf
-import threading
-import queue
+import os
 import sys
+
+# The audio engines in tiny_him are shared with the top-level scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "tiny_him"))
+import startup_profile
+startup_profile.install()
+
+import threading
 import platform
-import os
-from openai import OpenAI
+from capture import AudioCapture, save_wav, to_mono_float32
+import io_audio
+import transport
+import tts_cache
 
 # ========== CONFIG ==========
 
 AUDIO_INPUT_PATH = "input.wav"
+SAVE_RECORDING = False  # also write each recording to AUDIO_INPUT_PATH
 MODEL_SIZE = "base"  # whisper: tiny, base, small, medium, large
 OPENAI_MODEL = "gpt-4.1"
 IS_MAC = platform.system() == "Darwin"
@@ -33,12 +36,14 @@ def load_openai_key():
 
 
 def load_whisper_model(size="base"):
+    import whisper  # pulls in torch, so only when a model is actually needed
     print(f"🔍 Loading Whisper model: {size}")
     return whisper.load_model(size)
 
 
 def detect_microphone():
     try:
+        import sounddevice as sd
         devices = sd.query_devices()
         for device in devices:
             if device['max_input_channels'] > 0:
@@ -50,6 +55,7 @@ def detect_microphone():
 
 def detect_speaker():
     try:
+        import sounddevice as sd
         devices = sd.query_devices()
         for device in devices:
             if device['max_output_channels'] > 0 and 'dummy' not in device['name'].lower():
@@ -61,41 +67,41 @@ def detect_speaker():
 
 # ========== AUDIO RECORDING ==========
 
-def record_audio_interactive(output_path="input.wav", samplerate=16000, channels=1):
+_capture = None
+
+def get_capture():
+    # One preallocated ring buffer for the whole session (tiny_him/capture.py)
+    global _capture
+    if _capture is None:
+        _capture = AudioCapture(samplerate=16000, channels=1)
+    return _capture
+
+def record_audio_interactive(output_path=None):
     print("🎙️ Press ENTER to start recording...")
     input()
     print("⏺️ Recording... Press ENTER again to stop.")
 
-    q = queue.Queue()
-    recording = True
-
-    def callback(indata, frames, time, status):
-        if status:
-            print("⚠️", status, file=sys.stderr)
-        q.put(indata.copy())
+    stop_event = threading.Event()
 
-    with sf.SoundFile(output_path, mode='w', samplerate=samplerate,
-                      channels=channels) as file:
-        with sd.InputStream(samplerate=samplerate, channels=channels, callback=callback):
-            def stopper():
-                nonlocal recording
-                input()
-                recording = False
+    def stopper():
+        input()
+        stop_event.set()
 
-            threading.Thread(target=stopper).start()
+    threading.Thread(target=stopper, daemon=True).start()
+    capture = get_capture()
+    pcm = capture.record(stop_event)
 
-            while recording:
-                file.write(q.get())
-
-    print(f"💾 Audio saved to {output_path}")
-    return output_path
+    if output_path:
+        save_wav(pcm, capture.samplerate, output_path)
+        print(f"💾 Audio saved to {output_path}")
+    return pcm, capture.samplerate
 
 
 # ========== CORE LOGIC FUNCTIONS ==========
 
-def transcribe_audio(model, audio_path):
-    print(f"🎙️ Transcribing audio: {audio_path}")
-    result = model.transcribe(audio_path)
+def transcribe_audio(model, pcm, samplerate):
+    print(f"🎙️ Transcribing {len(pcm) / samplerate:.1f}s of audio")
+    result = model.transcribe(to_mono_float32(pcm, samplerate))
     print("🗣️ You said:", result["text"])
     return result["text"]
 
@@ -112,23 +118,25 @@ def query_chatgpt(client, prompt, OPENAI_MODEL):
 
 
 def synthesize_speech(text, output_path=None):
-    if not output_path:
-        output_path = f"response_{uuid.uuid4().hex}.mp3"
-    print("🎧 Generating TTS...")
-    tts = gTTS(text)
-    tts.save(output_path)
-    return output_path
+    def render(path):
+        from gtts import gTTS
+        print("🎧 Generating TTS...")
+        gTTS(text).save(path)
+        return path
+
+    if output_path:
+        return render(output_path)
+    # Cached by content hash (tiny_him/tts_cache.py) instead of a new response_<uuid>.mp3 per reply
+    return tts_cache.get_or_create(text, "gtts", None, None, ".mp3", render)
 
 
 def play_audio(path):
-    print(f"🔊 Playing audio: {path}")
+    # Through tiny_him's persistent output stream instead of a player process
+    # per clip; io_audio falls back to aplay/mpg123/afplay if it can't open
     try:
-        if IS_MAC:
-            subprocess.run(["afplay", path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        else:
-            subprocess.run(["mpg123", path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        io_audio.play_audio(path)
     except FileNotFoundError:
-        print("❌ 'mpg123' is not installed. Run: sudo apt install mpg123")
+        print("❌ 'mpg123' or 'aplay' not installed. Run: sudo apt install mpg123 aplay")
     except Exception as e:
         print("⚠️ Playback error:", e)
 
@@ -138,18 +146,24 @@ def main():
     global client, HAS_MIC, HAS_SPEAKER
 
     # Detect capabilities
-    HAS_MIC = detect_microphone()
-    HAS_SPEAKER = detect_speaker()
+    with startup_profile.step("audio devices"):
+        HAS_MIC = detect_microphone()
+        HAS_SPEAKER = detect_speaker()
 
     # Load OpenAI and Whisper
     os.environ["OPENAI_API_KEY"] = load_openai_key()
-    client = OpenAI()
-    whisper_model = load_whisper_model(MODEL_SIZE)
+    # On a shared keep-alive pool, warmed while the user is still talking (tiny_him/transport.py)
+    with startup_profile.step("openai client"):
+        client = transport.build_client()
+    transport.prewarm_async()
+    with startup_profile.step("whisper model"):
+        whisper_model = load_whisper_model(MODEL_SIZE) if HAS_MIC else None
+    startup_profile.report()
 
     # Input: Mic or keyboard
     if HAS_MIC:
-        record_audio_interactive(output_path=AUDIO_INPUT_PATH)
-        user_text = transcribe_audio(whisper_model, AUDIO_INPUT_PATH)
+        pcm, samplerate = record_audio_interactive(output_path=AUDIO_INPUT_PATH if SAVE_RECORDING else None)
+        user_text = transcribe_audio(whisper_model, pcm, samplerate)
     else:
         user_text = input("⌨️ Type your question: ")
 
@@ -1,19 +1,34 @@
-import whisper
-# from gtts import gTTS
-import uuid
+import os
+import sys
+
+# The audio engines in tiny_him are shared with the top-level scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "tiny_him"))
+import startup_profile
+startup_profile.install()
+
 import subprocess
 import threading
 import queue
-import sys
 import platform
-import os
 import re
 import socket
-from openai import OpenAI
-from gpiozero import Button, LED
+from capture import AudioCapture, find_input_device, save_wav
+import barge_in
+import config
+import conversation
+import gpio_handler
+import io_audio
+import llm_engine
+import metrics
+import models
+import offline_logic
+import transport
+import tts_cache
+import upload_audio
+from gpio_handler import set_state
+from io_audio import new_endpointer, read_wav
 from signal import pause
 import time
-import atexit
 import RPi.GPIO as GPIO
 
 sys.path.append('/usr/lib/python3/dist-packages')
@@ -21,6 +36,7 @@ sys.path.append('/usr/lib/python3/dist-packages')
 # ========== CONFIG ==========
 
 AUDIO_INPUT_PATH = "input.wav"
+SAVE_RECORDING = False       # also write each recording to AUDIO_INPUT_PATH
 MODEL_SIZE = "base"
 OPENAI_MODEL = "gpt-4.1"
 LOCAL_LLM_PATH = "phi-2.Q4_K_M.gguf"
@@ -31,65 +47,24 @@ USE_LOCAL_STT = False
 USE_LOCAL_LLM = False
 USE_LOCAL_TTS = False
 
+STREAM_REPLY = True             # speak each sentence of the GPT reply as soon as it arrives
+STREAM_MIN_SENTENCE_CHARS = 20
+
 interaction_lock = threading.Lock()
 stop_event = threading.Event()
 recording_active = False
 
-# ========== FORCE GPIO CLEANUP BEFORE USE ==========
-
-def force_gpio_release(pins=[17, 18]):
-    for pin in pins:
-        try:
-            with open("/sys/class/gpio/unexport", "w") as f:
-                f.write(str(pin))
-            print(f"✅ Released GPIO pin {pin}")
-        except Exception:
-            pass
-
-force_gpio_release([17, 18])
-
 # ========== GPIO SETUP ==========
 
-button = Button(17, pull_up=True, bounce_time=0.1)
-led = LED(18)
-atexit.register(GPIO.cleanup)
-
-state = "idle"
-running = True
-
-# ========== LED LOOP ==========
-
-def led_loop():
-    global state
-    while running:
-        if state == "idle":
-            led.off(); time.sleep(5); led.on(); time.sleep(0.1); led.off()
-        elif state == "ready":
-            led.on(); time.sleep(0.2)
-        elif state == "listening":
-            led.toggle(); time.sleep(0.1)
-        elif state == "processing":
-            led.toggle(); time.sleep(0.5)
-        elif state == "speaking":
-            for _ in range(3): led.on(); time.sleep(0.1); led.off(); time.sleep(0.1)
-            state = "ready"
-        else:
-            led.off(); time.sleep(0.1)
-
-def set_state(new_state):
-    global state
-    state = new_state
-    print(f"🔁 State: {state}")
-
-threading.Thread(target=led_loop, daemon=True).start()
+# The button, the LED and its state patterns come from tiny_him/gpio_handler.py
+gpio_handler.start_led_thread()
 
 # ========== UTILITY FUNCTIONS ==========
 
 def is_online(host="8.8.8.8", port=53, timeout=3):
     try:
-        socket.setdefaulttimeout(timeout)
-        socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, port))
-        return True
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
     except Exception:
         return False
 
@@ -117,10 +92,6 @@ def load_openai_key():
         print("❌ API key parts not found.")
         sys.exit(1)
 
-def load_whisper_model(size="base"):
-    print(f"🔍 Loading Whisper model: {size}")
-    return whisper.load_model(size)
-
 def detect_microphone():
     try:
         import sounddevice as sd
@@ -141,8 +112,29 @@ def detect_speaker():
 
 # ========== AUDIO RECORDING ==========
 
-def record_audio_interactive(output_path="input.wav", duration=None):
+_capture = None
+
+def get_capture():
+    # One preallocated ring buffer on the first real input device (tiny_him/capture.py)
+    global _capture
+    if _capture is None:
+        device, samplerate = find_input_device()
+        _capture = AudioCapture(samplerate=samplerate, channels=1, device=device)
+    return _capture
+
+def record_with_arecord(output_path=AUDIO_INPUT_PATH):
     print("🎤 Using fallback recorder (arecord)...")
+    cmd = ["arecord", "-D", "plughw:2,0", "-f", "cd", output_path]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while not stop_event.is_set():
+            time.sleep(0.1)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return read_wav(output_path, 16000), 16000
+
+def record_audio_interactive(output_path=None):
     global recording_active
     recording_active = True
     stop_event.clear()
@@ -156,136 +148,245 @@ def record_audio_interactive(output_path="input.wav", duration=None):
     threading.Thread(target=enter_listener, daemon=True).start()
 
     print("📼 Recording...")
-    cmd = ["arecord", "-D", "plughw:2,0", "-f", "cd", output_path]
-    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
+    endpointer = None
     try:
-        while not stop_event.is_set():
-            time.sleep(0.1)
+        try:
+            capture = get_capture()
+            # Stops by itself once the speaker goes quiet (config.VAD_* in tiny_him)
+            endpointer = new_endpointer(config, capture.samplerate)
+            pcm, samplerate = capture.record(stop_event, endpointer=endpointer), capture.samplerate
+        except Exception as e:
+            print("⚠️ Ring buffer capture failed:", e)
+            endpointer = None
+            pcm, samplerate = record_with_arecord()
     finally:
-        proc.terminate()
-        proc.wait()
         recording_active = False
-        print(f"💾 Audio saved to {output_path}")
-        time.sleep(0.5)
 
-    return output_path
+    if endpointer is not None and not endpointer.speech_detected:
+        print("🤫 No speech detected, skipping")
+        return None, samplerate
+    if output_path:
+        save_wav(pcm, samplerate, output_path)
+        print(f"💾 Audio saved to {output_path}")
+    return pcm, samplerate
 
 # ========== CORE LOGIC FUNCTIONS ==========
 
-def transcribe_audio_local(model, audio_path):
-    print(f"🎙️ Transcribing locally: {audio_path}")
-    result = model.transcribe(audio_path, language="en")
-    print("🗣️ You said:", result["text"])
-    return result["text"]
-
-def transcribe_audio_openai(client, audio_path):
-    print(f"🎙️ Transcribing via OpenAI API: {audio_path}")
-    with open(audio_path, "rb") as audio_file:
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file,
-            language="en"
-        )
+def transcribe_audio_local(pcm, samplerate):
+    # tiny_him's configured STT backend (faster-whisper int8 when installed),
+    # pinned by the model manager for this decode only
+    print(f"🎙️ Transcribing {len(pcm) / samplerate:.1f}s locally")
+    text = offline_logic.transcribe_audio_local(None, pcm, samplerate)
+    print("🗣️ You said:", text)
+    return text
+
+def transcribe_audio_openai(client, pcm, samplerate):
+    print(f"🎙️ Transcribing {len(pcm) / samplerate:.1f}s via OpenAI API")
+    # Downmixed, resampled, silence-trimmed and compressed (tiny_him/upload_audio.py)
+    name, data, raw_bytes = upload_audio.prepare(pcm, samplerate)
+    print(f"📦 Upload {raw_bytes // 1024} KB -> {len(data) // 1024} KB ({name.rsplit('.', 1)[1]})")
+    timing = {}
+    transcript = transport.run(client, lambda c: c.audio.transcriptions.create(
+        model="whisper-1",
+        file=(name, data),
+        language="en"
+    ), timing)
+    if "headers" in timing:
+        # Request out to response headers in, as tiny_him/online_logic.py records it
+        metrics.record("upload", timing["headers"] - timing["sent"], "online")
     print("🗣️ You said:", transcript.text)
     return transcript.text
 
 def query_llm(client, prompt, model_name, use_local=False):
+    # Both sides see tiny_him's conversation history, so follow-ups work
     if use_local:
         print("🧠 Using local LLM...")
         try:
-            from llama_cpp import Llama
-            llm = Llama(model_path=LOCAL_LLM_PATH, n_ctx=1024)
-            result = llm(SYSTEM_PROMPT + prompt, max_tokens=200)
-            reply = result["choices"][0]["text"].strip()
+            reply = llm_engine.complete(conversation.prompt(SYSTEM_PROMPT, prompt), model_path=LOCAL_LLM_PATH, system_prompt=SYSTEM_PROMPT)
             print("💬 Local LLM Response:", reply)
-            return reply
+        except InterruptedError:
+            raise
         except Exception as e:
             print("❌ Local LLM failed:", e)
             return "I'm offline and unable to respond."
     else:
         print("🤖 Querying ChatGPT...")
-        response = client.chat.completions.create(
+        response = transport.run(client, lambda c: c.chat.completions.create(
             model=model_name,
-            messages=[{"role": "user", "content": SYSTEM_PROMPT + prompt}]
-        )
+            messages=conversation.messages(SYSTEM_PROMPT, prompt)
+        ))
         reply = response.choices[0].message.content.strip()
         print("💬 GPT Response:", reply)
-        return reply
+    if not barge_in.cancelled():
+        conversation.add_turn(prompt, reply)
+    return reply
+
+def synthesize_speech_local(text, output_path=None):
+    # tiny_him's local engine (config.LOCAL_TTS_ENGINE): a stream that plays
+    # while it renders, or a cached WAV
+    print("🎧 Generating speech locally (offline)...")
+    try:
+        return offline_logic.synthesize_speech_local(text, output_path.replace(".mp3", ".wav") if output_path else None)
+    except Exception as e:
+        print("❌ Local TTS failed:", e)
+        return None
 
+# Clips are cached by content hash in tiny_him/tts_cache.py rather than written
+# to a new response_<uuid> file per reply; the cache is LRU-evicted by size
 def synthesize_speech_gtts(text, output_path=None, use_local=False):
-    if not output_path:
-        output_path = f"response_{uuid.uuid4().hex}.mp3"
-
     if use_local:
-        print("🎧 Generating speech with espeak (offline)...")
-        output_wav = output_path.replace(".mp3", ".wav")
-        try:
-            subprocess.run(["espeak", text, "-w", output_wav])
-            return output_wav
-        except Exception as e:
-            print("❌ espeak failed:", e)
-            return None
-    else:
-        print("🎧 Generating TTS via gTTS (online)...")
-        tts = gTTS(text)
-        tts.save(output_path)
-        return output_path
+        return synthesize_speech_local(text, output_path)
+    from gtts import gTTS
+    print("🎧 Generating TTS via gTTS (online)...")
 
-def synthesize_speech_openai(text, output_path=None, use_local=False):
-    if not output_path:
-        output_path = f"response_{uuid.uuid4().hex}.mp3"
+    def render(path):
+        gTTS(text).save(path)
+        return path
 
+    if output_path:
+        return render(output_path)
+    return tts_cache.get_or_create(text, "gtts", None, None, ".mp3", render)
+
+def synthesize_speech_openai(text, output_path=None, use_local=False, model="tts-1", voice="nova"):
     if use_local:
-        print("🎧 Generating speech with espeak (offline)...")
-        output_wav = output_path.replace(".mp3", ".wav")
-        try:
-            subprocess.run(["espeak", text, "-w", output_wav])
-            return output_wav
-        except Exception as e:
-            print("❌ espeak failed:", e)
-            return None
-    else:
-        print("🧬 Generating TTS via OpenAI API...")
-        try:
-            response = client.audio.speech.create(
-                model="tts-1",  # or "tts-1-hd"
-                voice="nova",   # "nova", "alloy", "echo", "fable", "onyx", "shimmer"
-                input=text
-            )
-            with open(output_path, "wb") as f:
-                f.write(response.content)
-            return output_path
-        except Exception as e:
-            print("❌ OpenAI TTS failed:", e)
-            return None
+        return synthesize_speech_local(text, output_path)
+    print("🧬 Generating TTS via OpenAI API...")
+
+    def render(path):
+        response = transport.run(client, lambda c: c.audio.speech.create(
+            model=model,  # or "tts-1-hd"
+            voice=voice,  # "nova", "alloy", "echo", "fable", "onyx", "shimmer"
+            input=text
+        ))
+        with open(path, "wb") as f:
+            f.write(response.content)
+        return path
+
+    try:
+        if output_path:
+            return render(output_path)
+        return tts_cache.get_or_create(text, "openai", voice, model, ".mp3", render)
+    except Exception as e:
+        print("❌ OpenAI TTS failed:", e)
+        return None
 
 def play_audio(path):
-    print(f"🔊 Playing audio: {path}")
+    # Through tiny_him's persistent output stream instead of a player process
+    # per clip; io_audio falls back to aplay/mpg123/afplay if it can't open
     try:
-        if IS_MAC:
-            subprocess.run(["afplay", path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        elif path.endswith(".wav"):
-            subprocess.run(["aplay", path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        else:
-            subprocess.run(["mpg123", path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        io_audio.play_audio(path)
+    except FileNotFoundError:
+        print("❌ 'mpg123' or 'aplay' not installed. Run: sudo apt install mpg123 aplay")
     except Exception as e:
         print("⚠️ Playback error:", e)
 
+# ========== STREAMING REPLY ==========
+
+SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+def stream_llm_sentences(client, prompt, model_name):
+    print("🤖 Streaming ChatGPT...")
+    stream = client.chat.completions.create(
+        model=model_name,
+        messages=conversation.messages(SYSTEM_PROMPT, prompt),
+        stream=True
+    )
+    # A barge-in closes the stream mid-response
+    barge_in.register(stream)
+    buffer = ""
+    try:
+        for chunk in stream:
+            if barge_in.cancelled():
+                return
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            buffer += chunk.choices[0].delta.content
+            while True:
+                m = SENTENCE_END.search(buffer, min(STREAM_MIN_SENTENCE_CHARS, len(buffer)))
+                if not m:
+                    break
+                sentence = buffer[:m.start()].strip()
+                buffer = buffer[m.end():]
+                if sentence:
+                    yield sentence
+    finally:
+        barge_in.unregister(stream)
+        stream.close()
+    if buffer.strip() and not barge_in.cancelled():
+        yield buffer.strip()
+
+def speak_streamed(sentences):
+    audio_q = queue.Queue()
+    start = time.perf_counter()
+    token = barge_in.token()
+
+    def player():
+        first = True
+        while True:
+            path = audio_q.get()
+            if path is None:
+                break
+            if token.is_set():
+                continue
+            if first:
+                first = False
+                print(f"⏱️ Time to first audio: {time.perf_counter() - start:.2f}s")
+                set_state("speaking")
+            play_audio(path)
+
+    t = threading.Thread(target=player, daemon=True)
+    t.start()
+
+    spoken = []
+    try:
+        for sentence in sentences:
+            if token.is_set():
+                break
+            spoken.append(sentence)
+            path = synthesize_speech_openai(sentence, use_local=USE_LOCAL_TTS)
+            if path:
+                audio_q.put(path)
+    finally:
+        audio_q.put(None)
+        t.join()
+    reply = " ".join(spoken)
+    print("💬 GPT Response:", reply)
+    return reply
+
 # ========== INTERACTION FUNCTIONS ==========
 
 def start_interaction():
+    if not USE_LOCAL_STT:
+        transport.prewarm_async()  # connection ready by the time the recording is
     set_state("listening")
-    record_audio_interactive(output_path=AUDIO_INPUT_PATH)
+    barge_in.report_listening()
+    pcm, samplerate = record_audio_interactive(output_path=AUDIO_INPUT_PATH if SAVE_RECORDING else None)
+    if pcm is None:
+        set_state("ready")
+        print("📥 Press the button or ENTER to start...")
+        return
 
     set_state("processing")
     if USE_LOCAL_STT:
-        user_text = transcribe_audio_local(whisper_model, AUDIO_INPUT_PATH)
+        user_text = transcribe_audio_local(pcm, samplerate)
     else:
-        user_text = transcribe_audio_openai(client, AUDIO_INPUT_PATH)
+        user_text = transcribe_audio_openai(client, pcm, samplerate)
+    if barge_in.cancelled():
+        return
+
+    if STREAM_REPLY and has_speaker and not USE_LOCAL_LLM:
+        reply_text = speak_streamed(stream_llm_sentences(client, user_text, OPENAI_MODEL))
+        if not barge_in.cancelled():
+            conversation.add_turn(user_text, reply_text)
+        conversation.compact_async(client, True)
+        set_state("ready")
+        print("📥 Press the button or ENTER to start...")
+        return
 
     reply_text = query_llm(client, user_text, OPENAI_MODEL, use_local=USE_LOCAL_LLM)
     audio_path = synthesize_speech_openai(reply_text, use_local=USE_LOCAL_TTS)
+    if barge_in.cancelled():
+        return
 
     set_state("speaking")
     if has_speaker and audio_path:
@@ -293,43 +394,92 @@ def start_interaction():
     else:
         print("🔇 No speaker detected or audio not generated.")
 
+    conversation.compact_async(client, not USE_LOCAL_LLM)
+    set_state("ready")
     print("📥 Press the button or ENTER to start...")
 
 
-def safe_start_interaction():
-    if not interaction_lock.acquire(blocking=False):
-        print("⏳ Already running, ignoring extra trigger.")
-        return
+def run_interaction(token):
+    # On a worker thread, so the button can still barge in while it runs
+    barge_in.bind(token)
     try:
         start_interaction()
-        time.sleep(0.5)
+    except Exception as e:
+        if not token.is_set():
+            print("⚠️ Interaction failed:", e)
+            set_state("ready")
+            print("📥 Press the button or ENTER to start...")
     finally:
+        if token.is_set():
+            print("✋ Interaction cancelled")
+            set_state("ready")
+            print("📥 Press the button or ENTER to start...")
         interaction_lock.release()
 
+def launch_interaction():
+    # With interaction_lock held; the worker releases it when done
+    stop_event.clear()
+    worker = threading.Thread(target=run_interaction, args=(barge_in.begin(),), daemon=True)
+    worker.start()
+    return worker
+
+def safe_start_interaction():
+    if not interaction_lock.acquire(blocking=False):
+        print("⏳ Already running, ignoring extra trigger.")
+        return None
+    return launch_interaction()
+
+def cancel_interaction(reason):
+    print(f"🛑 {reason}: cancelling")
+    barge_in.abort()
+    stop_event.set()
+
+def interrupt_interaction():
+    # Barge-in: abort requests and playback, then go straight back to listening
+    print("✋ Barge-in")
+    barge_in.abort()
+    if not interaction_lock.acquire(timeout=config.BARGE_IN_TIMEOUT):
+        print("⚠️ Interaction did not stop in time, ignoring press")
+        return
+    launch_interaction()
+
 # ========== BUTTON LISTENER LOOP ==========
 
 def button_loop():
+    # Gestures from gpio_handler's queue, so presses made while busy aren't lost
     while True:
-        button.wait_for_press()
-        if state == "ready":
-            safe_start_interaction()
+        event = gpio_handler.button_events.get()
+        if event.kind in ("long_press", "double_press"):
+            # A double press drops whatever its first press started and the history
+            if interaction_lock.locked():
+                cancel_interaction("Long press" if event.kind == "long_press" else "Double press")
+            if event.kind == "double_press":
+                conversation.reset()
+                print("🆕 New conversation")
         elif recording_active:
             print("🛑 Button pressed to stop recording.")
             stop_event.set()
-        time.sleep(0.3)
+        elif gpio_handler.state == "ready":
+            safe_start_interaction()
+        elif config.BARGE_IN and gpio_handler.state in ("processing", "speaking"):
+            interrupt_interaction()
 
 # ========== ENTER KEY LISTENER ==========
 
 def wait_for_enter_key():
     while True:
         input("🖱️ Press ENTER to start interaction...\n")
-        safe_start_interaction()
+        worker = safe_start_interaction()
+        if worker:
+            worker.join()
 
 # ========== INIT & RUN ==========
 
 if __name__ == "__main__":
-    pi_model = detect_pi_model()
-    online = is_online()
+    with startup_profile.step("detect pi model"):
+        pi_model = detect_pi_model()
+    with startup_profile.step("connectivity check"):
+        online = is_online()
     print(f"🌐 Online: {online}")
 
     if pi_model == "Pi 5" and not online:
@@ -342,13 +492,27 @@ if __name__ == "__main__":
     print(f"🧩 Using local TTS: {USE_LOCAL_TTS}")
 
     os.environ["OPENAI_API_KEY"] = load_openai_key()
-    client = OpenAI()
-    whisper_model = load_whisper_model(MODEL_SIZE) if USE_LOCAL_STT else None
-
-    has_mic = detect_microphone()
-    has_speaker = detect_speaker()
+    # On a shared keep-alive pool, kept warm between questions (tiny_him/transport.py)
+    with startup_profile.step("openai client"):
+        client = transport.build_client()
+    if online:
+        transport.prewarm_async()
+        transport.start_keepalive()
+    with startup_profile.step("whisper model"):
+        # Loaded under the model manager, so the memory budget can evict it
+        # for the LLM and reload it when it's next needed
+        config.MODEL_SIZE = MODEL_SIZE
+        if USE_LOCAL_STT:
+            models.get("stt")
+    if USE_LOCAL_LLM:
+        llm_engine.preload(LOCAL_LLM_PATH, SYSTEM_PROMPT)
+
+    with startup_profile.step("audio devices"):
+        has_mic = detect_microphone()
+        has_speaker = detect_speaker()
 
     set_state("ready")
+    startup_profile.report()
 
     threading.Thread(target=button_loop, daemon=True).start()
     threading.Thread(target=wait_for_enter_key, daemon=True).start()
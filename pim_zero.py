@@ -1,24 +1,35 @@
-import whisper
-from gtts import gTTS
-import uuid
-import subprocess
-import sounddevice as sd
-import soundfile as sf
-import threading
-import queue
+import os
 import sys
+
+# The audio engines in tiny_him are shared with the top-level scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "tiny_him"))
+import startup_profile
+startup_profile.install()
+
+import threading
 import platform
-import os
 import re
 import socket
-from openai import OpenAI
+from capture import AudioCapture, find_input_device, save_wav
+import config
+import conversation
+import io_audio
+import llm_engine
+import metrics
+import models
+import offline_logic
+import transport
+import tts_cache
+import upload_audio
 
 # ========== CONFIG ==========
 
 AUDIO_INPUT_PATH = "input.wav"
+SAVE_RECORDING = False       # also write each recording to AUDIO_INPUT_PATH
 MODEL_SIZE = "base"
 OPENAI_MODEL = "gpt-4.1"
 LOCAL_LLM_PATH = "phi-2.Q4_K_M.gguf"
+LOCAL_SYSTEM_PROMPT = "You are a helpful assistant. Answer concisely:\n"
 IS_MAC = platform.system() == "Darwin"
 
 # Fallback flags (auto-set below)
@@ -30,9 +41,8 @@ USE_LOCAL_TTS = False
 
 def is_online(host="8.8.8.8", port=53, timeout=3):
     try:
-        socket.setdefaulttimeout(timeout)
-        socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, port))
-        return True
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
     except Exception:
         return False
 
@@ -62,12 +72,9 @@ def load_openai_key():
         print("❌ API key parts not found.")
         sys.exit(1)
 
-def load_whisper_model(size="base"):
-    print(f"🔍 Loading Whisper model: {size}")
-    return whisper.load_model(size)
-
 def detect_microphone():
     try:
+        import sounddevice as sd
         devices = sd.query_devices()
         return any(d['max_input_channels'] > 0 for d in devices)
     except Exception as e:
@@ -76,6 +83,7 @@ def detect_microphone():
 
 def detect_speaker():
     try:
+        import sounddevice as sd
         devices = sd.query_devices()
         return any(d['max_output_channels'] > 0 and 'dummy' not in d['name'].lower() for d in devices)
     except Exception as e:
@@ -84,123 +92,116 @@ def detect_speaker():
 
 # ========== AUDIO RECORDING ==========
 
-def record_audio_interactive(output_path="input.wav", samplerate=None, channels=1):
+_capture = None
+
+def get_capture():
+    # One preallocated ring buffer on the first real input device (tiny_him/capture.py)
+    global _capture
+    if _capture is None:
+        device, samplerate = find_input_device()
+        print(f"🎚️ Using supported sample rate: {samplerate}")
+        _capture = AudioCapture(samplerate=samplerate, channels=1, device=device)
+    return _capture
+
+def record_audio_interactive(output_path=None):
     print("🎙️ Press ENTER to start recording...")
     input()
+    capture = get_capture()
     print("⏺️ Recording... Press ENTER again to stop.")
 
-    q = queue.Queue()
-    recording = True
+    stop_event = threading.Event()
 
-    # Select the first real input device
-    mic_index = None
-    try:
-        devices = sd.query_devices()
-        for idx, dev in enumerate(devices):
-            name = dev['name'].lower()
-            if dev['max_input_channels'] > 0 and 'monitor' not in name and 'dummy' not in name:
-                mic_index = idx
-                print(f"🎤 Selected input device: {dev['name']} (device #{idx})")
-                if samplerate is None:
-                    samplerate = int(dev['default_samplerate'])
-                    print(f"🎚️ Using supported sample rate: {samplerate}")
-                break
-    except Exception as e:
-        print("⚠️ Could not list input devices:", e)
+    def stopper():
+        input()
+        stop_event.set()
 
-    if mic_index is None:
-        print("⚠️ No suitable mic found. Using default.")
-        mic_index = None
+    threading.Thread(target=stopper, daemon=True).start()
+    pcm = capture.record(stop_event)
 
-    def callback(indata, frames, time, status):
-        if status:
-            print("⚠️", status, file=sys.stderr)
-        q.put(indata.copy())
-
-    with sf.SoundFile(output_path, mode='w', samplerate=samplerate, channels=channels) as file:
-        with sd.InputStream(samplerate=samplerate, channels=channels, callback=callback, device=mic_index):
-            def stopper():
-                nonlocal recording
-                input()
-                recording = False
-
-            threading.Thread(target=stopper).start()
-            while recording:
-                file.write(q.get())
-
-    print(f"💾 Audio saved to {output_path}")
-    return output_path
+    if output_path:
+        save_wav(pcm, capture.samplerate, output_path)
+        print(f"💾 Audio saved to {output_path}")
+    return pcm, capture.samplerate
 
 # ========== CORE LOGIC FUNCTIONS ==========
 
-def transcribe_audio_local(model, audio_path):
-    print(f"🎙️ Transcribing locally: {audio_path}")
-    result = model.transcribe(audio_path)
-    print("🗣️ You said:", result["text"])
-    return result["text"]
-
-def transcribe_audio_openai(client, audio_path):
-    print(f"🎙️ Transcribing via OpenAI API: {audio_path}")
-    with open(audio_path, "rb") as audio_file:
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file
-        )
+def transcribe_audio_local(pcm, samplerate):
+    # tiny_him's configured STT backend (faster-whisper int8 when installed),
+    # pinned by the model manager for this decode only
+    print(f"🎙️ Transcribing {len(pcm) / samplerate:.1f}s locally")
+    text = offline_logic.transcribe_audio_local(None, pcm, samplerate)
+    print("🗣️ You said:", text)
+    return text
+
+def transcribe_audio_openai(client, pcm, samplerate):
+    print(f"🎙️ Transcribing {len(pcm) / samplerate:.1f}s via OpenAI API")
+    # Downmixed, resampled, silence-trimmed and compressed (tiny_him/upload_audio.py)
+    name, data, raw_bytes = upload_audio.prepare(pcm, samplerate)
+    print(f"📦 Upload {raw_bytes // 1024} KB -> {len(data) // 1024} KB ({name.rsplit('.', 1)[1]})")
+    # Through tiny_him's keep-alive transport, which also times the upload
+    timing = {}
+    transcript = transport.run(client, lambda c: c.audio.transcriptions.create(
+        model="whisper-1",
+        file=(name, data)
+    ), timing)
+    if "headers" in timing:
+        # Request out to response headers in, as tiny_him/online_logic.py records it
+        metrics.record("upload", timing["headers"] - timing["sent"], "online")
     print("🗣️ You said:", transcript.text)
     return transcript.text
 
 def query_llm(client, prompt, model_name, use_local=False):
+    # Both sides see tiny_him's conversation history, so follow-ups work
     if use_local:
         print("🧠 Using local LLM...")
         try:
-            from llama_cpp import Llama
-            llm = Llama(model_path=LOCAL_LLM_PATH, n_ctx=1024)
-            system_prompt = "You are a helpful assistant. Answer concisely:\n"
-            result = llm(system_prompt + prompt, max_tokens=200)
-            reply = result["choices"][0]["text"].strip()
+            reply = llm_engine.complete(conversation.prompt(LOCAL_SYSTEM_PROMPT, prompt), model_path=LOCAL_LLM_PATH, system_prompt=LOCAL_SYSTEM_PROMPT)
             print("💬 Local LLM Response:", reply)
-            return reply
         except Exception as e:
             print("❌ Local LLM failed:", e)
             return "I'm offline and unable to respond."
     else:
         print("🤖 Querying ChatGPT...")
-        response = client.chat.completions.create(
+        response = transport.run(client, lambda c: c.chat.completions.create(
             model=model_name,
-            messages=[{"role": "user", "content": prompt}]
-        )
+            messages=conversation.messages("", prompt)
+        ))
         reply = response.choices[0].message.content.strip()
         print("💬 GPT Response:", reply)
-        return reply
+    conversation.add_turn(prompt, reply)
+    return reply
 
-def synthesize_speech(text, output_path=None, use_local=False):
-    if not output_path:
-        output_path = f"response_{uuid.uuid4().hex}.mp3"
+def synthesize_speech_local(text, output_path=None):
+    # tiny_him's local engine (config.LOCAL_TTS_ENGINE): a stream that plays
+    # while it renders, or a cached WAV
+    print("🎧 Generating speech locally (offline)...")
+    try:
+        return offline_logic.synthesize_speech_local(text, output_path.replace(".mp3", ".wav") if output_path else None)
+    except Exception as e:
+        print("❌ Local TTS failed:", e)
+        return None
 
+def synthesize_speech(text, output_path=None, use_local=False):
+    # Cached by content hash (tiny_him/tts_cache.py) instead of a new response_<uuid> file per reply
     if use_local:
-        print("🎧 Generating speech with espeak (offline)...")
-        output_wav = output_path.replace(".mp3", ".wav")
-        try:
-            subprocess.run(["espeak", text, "-w", output_wav])
-            return output_wav
-        except Exception as e:
-            print("❌ espeak failed:", e)
-            return None
+        return synthesize_speech_local(text, output_path)
     else:
+        from gtts import gTTS
         print("🎧 Generating TTS via gTTS (online)...")
-        tts = gTTS(text)
-        tts.save(output_path)
-        return output_path
+
+        def render(path):
+            gTTS(text).save(path)
+            return path
+
+        if output_path:
+            return render(output_path)
+        return tts_cache.get_or_create(text, "gtts", None, None, ".mp3", render)
 
 def play_audio(path):
-    print(f"🔊 Playing audio: {path}")
+    # Through tiny_him's persistent output stream instead of a player process
+    # per clip; io_audio falls back to aplay/mpg123/afplay if it can't open
     try:
-        if IS_MAC:
-            subprocess.run(["afplay", path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        elif path.endswith(".wav"):
-            subprocess.run(["aplay", path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        else:
-            subprocess.run(["mpg123", path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        io_audio.play_audio(path)
     except FileNotFoundError:
         print("❌ 'mpg123' or 'aplay' not installed. Run: sudo apt install mpg123 aplay")
     except Exception as e:
@@ -212,8 +213,10 @@ def main():
     global USE_LOCAL_STT, USE_LOCAL_LLM, USE_LOCAL_TTS
 
     # Detect system status
-    pi_model = detect_pi_model()
-    online = is_online()
+    with startup_profile.step("detect pi model"):
+        pi_model = detect_pi_model()
+    with startup_profile.step("connectivity check"):
+        online = is_online()
     print(f"🌐 Online: {online}")
 
     # Set fallback flags
@@ -231,25 +234,41 @@ def main():
     print(f"🧩 Using local TTS: {USE_LOCAL_TTS}")
 
     # Detect devices
-    has_mic = detect_microphone()
-    has_speaker = detect_speaker()
+    with startup_profile.step("audio devices"):
+        has_mic = detect_microphone()
+        has_speaker = detect_speaker()
 
     # Load APIs and models
     os.environ["OPENAI_API_KEY"] = load_openai_key()
-    client = OpenAI()
-    whisper_model = load_whisper_model(MODEL_SIZE) if USE_LOCAL_STT else None
-
+    # On a shared keep-alive pool, kept warm between questions (tiny_him/transport.py)
+    with startup_profile.step("openai client"):
+        client = transport.build_client()
+    if online:
+        transport.prewarm_async()
+        transport.start_keepalive()
+    with startup_profile.step("whisper model"):
+        # Loaded under the model manager, so the memory budget can evict it
+        # for the LLM and reload it when it's next needed
+        config.MODEL_SIZE = MODEL_SIZE
+        if USE_LOCAL_STT:
+            models.get("stt")
+    if USE_LOCAL_LLM:
+        llm_engine.preload(LOCAL_LLM_PATH, LOCAL_SYSTEM_PROMPT)
+
+    startup_profile.report()
     print("🌀 Ready. Say or type 'exit' to quit.\n")
 
     while True:
         try:
             # Get input
             if has_mic:
-                record_audio_interactive(output_path=AUDIO_INPUT_PATH)
+                if not USE_LOCAL_STT:
+                    transport.prewarm_async()  # connection ready by the time the recording is
+                pcm, samplerate = record_audio_interactive(output_path=AUDIO_INPUT_PATH if SAVE_RECORDING else None)
                 if USE_LOCAL_STT:
-                    user_text = transcribe_audio_local(whisper_model, AUDIO_INPUT_PATH)
+                    user_text = transcribe_audio_local(pcm, samplerate)
                 else:
-                    user_text = transcribe_audio_openai(client, AUDIO_INPUT_PATH)
+                    user_text = transcribe_audio_openai(client, pcm, samplerate)
             else:
                 user_text = input("⌨️ Type your question: ")
 
@@ -270,6 +289,7 @@ def main():
                 play_audio(audio_path)
             else:
                 print("🔇 No speaker detected or audio not generated.")
+            conversation.compact_async(client, not USE_LOCAL_LLM)
 
         except KeyboardInterrupt:
             print("\n👋 Exiting by Ctrl+C")
@@ -0,0 +1,161 @@
+import atexit
+import json
+import os
+import re
+import threading
+import time
+
+import config
+
+_lock = threading.Lock()
+_entries = None        # _key(question, context) -> entry dict
+_embedder = None
+_matrix = None         # unit-norm embeddings, one row per key in _matrix_keys
+_matrix_keys = []
+_matrix_contexts = []
+_save_timer = None
+
+def normalize(text):
+    text = re.sub(r"[^\w\s']", " ", text.lower())
+    return " ".join(text.split())
+
+def _key(question, context):
+    # Answers given without history keep the bare question as their key.
+    # normalize() strips "/", so it can't be confused with a question.
+    return f"{context}/{question}" if context else question
+
+def _contexts(key, context):
+    # The histories whose answers may serve this question
+    if not context:
+        return [""]
+    if config.ANSWER_CACHE_CONTEXT_FREE and not re.search(config.ANSWER_CACHE_FOLLOWUP, key):
+        return [context, ""]
+    return [context]
+
+def cacheable(key):
+    # Answers that depend on when they were asked ("what time is it", the
+    # weather) would be replayed stale, so those questions are never cached
+    return bool(key) and not re.search(config.ANSWER_CACHE_EXCLUDE, key)
+
+def _load():
+    global _entries
+    _entries = {}
+    if os.path.exists(config.ANSWER_CACHE_PATH):
+        try:
+            with open(config.ANSWER_CACHE_PATH, "r") as f:
+                _entries = json.load(f)
+        except Exception as e:
+            print("⚠️ Could not read answer cache:", e)
+    _prune()
+
+def _prune():
+    global _matrix
+    now = time.time()
+    expired = [k for k, e in _entries.items() if now - e["created"] > config.ANSWER_CACHE_TTL]
+    for k in expired:
+        del _entries[k]
+    if expired:
+        _matrix = None
+
+def save():
+    with _lock:
+        if _entries is None:
+            return
+        tmp_path = config.ANSWER_CACHE_PATH + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(_entries, f)
+        os.replace(tmp_path, config.ANSWER_CACHE_PATH)
+
+atexit.register(save)
+
+def _save_later():
+    # Hits only bump counters: batch them into one write ANSWER_CACHE_SAVE_DELAY
+    # seconds later instead of rewriting the file (embeddings and all) per hit
+    global _save_timer
+
+    def flush():
+        global _save_timer
+        with _lock:
+            _save_timer = None
+        save()
+
+    with _lock:
+        if _save_timer is None:
+            _save_timer = threading.Timer(config.ANSWER_CACHE_SAVE_DELAY, flush)
+            _save_timer.daemon = True
+            _save_timer.start()
+
+def _embed(text):
+    global _embedder
+    import numpy as np
+    if _embedder is None:
+        from sentence_transformers import SentenceTransformer
+        print(f"🔍 Loading embedding model: {config.ANSWER_CACHE_EMBEDDING_MODEL}")
+        _embedder = SentenceTransformer(config.ANSWER_CACHE_EMBEDDING_MODEL)
+    vec = np.asarray(_embedder.encode(text), dtype=np.float32)
+    return vec / (np.linalg.norm(vec) or 1.0)
+
+def _semantic_match(vec, contexts):
+    global _matrix, _matrix_keys, _matrix_contexts
+    import numpy as np
+    if _matrix is None:
+        _matrix_keys = [k for k, e in _entries.items() if e.get("embedding")]
+        _matrix_contexts = np.array([_entries[k].get("context", "") for k in _matrix_keys], dtype=object)
+        _matrix = np.array([_entries[k]["embedding"] for k in _matrix_keys], dtype=np.float32)
+    if not len(_matrix_keys):
+        return None, 0.0
+    scores = np.where(np.isin(_matrix_contexts, contexts), _matrix @ vec, -1.0)
+    best = int(np.argmax(scores))
+    if scores[best] < -0.5:
+        return None, 0.0
+    return _matrix_keys[best], float(scores[best])
+
+def lookup(question, context=""):
+    # context: conversation.digest() of the history the question is asked against
+    if not config.ANSWER_CACHE_ENABLED:
+        return None
+    key = normalize(question)
+    if not cacheable(key):
+        return None
+    contexts = _contexts(key, context)
+    vec = _embed(key) if config.ANSWER_CACHE_SEMANTIC else None
+    with _lock:
+        if _entries is None:
+            _load()
+        _prune()
+        entry = next((_entries[_key(key, c)] for c in contexts if _key(key, c) in _entries), None)
+        score = 1.0
+        if entry is None and vec is not None:
+            match, score = _semantic_match(vec, contexts)
+            if match and score >= config.ANSWER_CACHE_SIMILARITY:
+                entry = _entries[match]
+        if entry is None:
+            return None
+        entry["hits"] += 1
+        entry["last_hit"] = time.time()
+    print(f"🗃️ Answer cache hit ({score:.2f}, {entry['hits']} hits): {entry['question']}")
+    _save_later()
+    return entry["answer"]
+
+def store(question, answer, context=""):
+    global _matrix
+    if not config.ANSWER_CACHE_ENABLED or not answer:
+        return
+    key = normalize(question)
+    if not cacheable(key):
+        return
+    vec = _embed(key) if config.ANSWER_CACHE_SEMANTIC else None
+    with _lock:
+        if _entries is None:
+            _load()
+        _entries[_key(key, context)] = {
+            "question": key,
+            "context": context,
+            "answer": answer,
+            "created": time.time(),
+            "hits": 0,
+            "last_hit": None,
+            "embedding": vec.tolist() if vec is not None else None,
+        }
+        _matrix = None
+    save()
@@ -0,0 +1,89 @@
+import contextvars
+import threading
+import time
+
+# Abort signal for a button press that interrupts processing or speaking.
+# Every interaction gets its own CancelToken, bound to the threads working on
+# it, so aborting one can never be undone by the next one starting. Streaming
+# and blocking requests register themselves so they can be closed mid-response;
+# the local LLM polls its token between tokens.
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._closers = set()
+        self._lock = threading.Lock()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    def register(self, stream):
+        with self._lock:
+            if not self._event.is_set():
+                self._closers.add(stream)
+                return
+        # Registered after the abort: close it right away
+        _close(stream)
+
+    def unregister(self, stream):
+        with self._lock:
+            self._closers.discard(stream)
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            streams = list(self._closers)
+            self._closers.clear()
+        for stream in streams:
+            _close(stream)
+
+def _close(stream):
+    try:
+        stream.close()
+    except Exception:
+        pass
+
+_NEVER = CancelToken()      # bound outside any interaction, never cancelled
+_token = contextvars.ContextVar("barge_in_token", default=_NEVER)
+_current = _NEVER           # the newest interaction's token, for abort()
+_pressed_at = None
+
+def begin():
+    # A fresh token for the interaction about to start
+    global _current
+    _current = CancelToken()
+    return _current
+
+def bind(token):
+    # Threads started without copying the context see the never-cancelled token
+    _token.set(token)
+    return token
+
+def token():
+    return _token.get()
+
+def cancelled():
+    return _token.get().is_set()
+
+def register(stream):
+    _token.get().register(stream)
+
+def unregister(stream):
+    _token.get().unregister(stream)
+
+def abort():
+    global _pressed_at
+    _pressed_at = time.perf_counter()
+    _current.cancel()
+    from io_audio import stop_playback
+    stop_playback()
+
+def report_listening():
+    # Called once the next recording has started
+    global _pressed_at
+    if _pressed_at is not None:
+        print(f"⏱️ Barge-in: back to listening in {(time.perf_counter() - _pressed_at) * 1000:.0f} ms")
+        _pressed_at = None
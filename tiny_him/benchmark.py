@@ -0,0 +1,105 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Headless end-to-end latency benchmark: mock GPIO pins, a fixture WAV in
+# place of the microphone and a local stand-in for the OpenAI API. Each
+# pipeline configuration runs the full interaction several times and reports
+# time to first audio and throughput.
+#
+#   python3 benchmark.py --runs 20 --ttft 0.6 --token-delay 0.03
+
+import config
+config.GPIO_PIN_FACTORY = "mock"
+import metrics
+from fake_openai import FakeOpenAIConfig, start_server
+
+CONFIGURATIONS = {
+    "sequential": {"PIPELINE_ASYNC": False, "STREAMING_PIPELINE": False},
+    "sequential+streaming": {"PIPELINE_ASYNC": False, "STREAMING_PIPELINE": True},
+    "async": {"PIPELINE_ASYNC": True, "STREAMING_PIPELINE": True},
+}
+
+def quantiles(values):
+    return " ".join(
+        f"p{int(q * 100)}={metrics.percentile(values, q) * 1000:.0f}ms" for q in metrics.QUANTILES
+    )
+
+def run_configuration(name, overrides, client, runs):
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    metrics.reset()
+    from interaction import run_interaction
+    import pipeline
+
+    stop_event = threading.Event()
+    totals = []
+    start = time.perf_counter()
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        if config.PIPELINE_ASYNC:
+            pipeline.wait(pipeline.submit(pipeline.run_pipeline(client, config, stop_event)))
+        else:
+            run_interaction(client, config, stop_event)
+        totals.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "name": name,
+        "ttfa": metrics.samples("first_audio", "online"),
+        "totals": totals,
+        "throughput": runs / elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark with a fake OpenAI server")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--fixture", default=os.path.join(os.path.dirname(__file__), "..", "input.wav"))
+    parser.add_argument("--stt-latency", type=float, default=0.3)
+    parser.add_argument("--ttft", type=float, default=0.4)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--tts-latency", type=float, default=0.25)
+    parser.add_argument("--config", action="append", choices=sorted(CONFIGURATIONS),
+                        help="pipeline configuration to run (repeatable, default: all)")
+    args = parser.parse_args()
+
+    server, base_url = start_server(FakeOpenAIConfig(
+        stt_latency=args.stt_latency,
+        ttft=args.ttft,
+        token_delay=args.token_delay,
+        tts_latency=args.tts_latency
+    ))
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    os.environ["OPENAI_BASE_URL"] = base_url
+
+    config.AUDIO_INPUT_PATH = os.path.abspath(args.fixture)
+    config.CAPTURE_BACKEND = "file"
+    config.PLAYER_BACKEND = "null"
+    config.TTS_CACHE_ENABLED = False
+    config.ANSWER_CACHE_ENABLED = False
+    config.HISTORY_ENABLED = False
+    config.METRICS_TEXTFILE = None
+    config.METRICS_JSONL = None
+
+    import transport
+    client = transport.build_client()
+
+    # Uncached TTS writes response_<uuid>.mp3 into the working directory
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        results = [
+            run_configuration(name, CONFIGURATIONS[name], client, args.runs)
+            for name in (args.config or CONFIGURATIONS)
+        ]
+    server.shutdown()
+
+    print(f"\n📊 {args.runs} runs per configuration against {base_url}")
+    for r in results:
+        print(f"{r['name']:<22} first audio {quantiles(r['ttfa'])}")
+        print(f"{'':<22} interaction {quantiles(r['totals'])}  {r['throughput']:.2f} interactions/s")
+
+if __name__ == "__main__":
+    sys.exit(main())
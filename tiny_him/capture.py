@@ -0,0 +1,147 @@
+import io
+import threading
+import wave
+
+import numpy as np
+
+WHISPER_SAMPLERATE = 16000
+
+class AudioCapture:
+    # Microphone capture into a preallocated int16 ring buffer. The sounddevice
+    # callback only copies into the buffer, so there is no per-block allocation,
+    # no subprocess and no disk round-trip. Positions are absolute frame counts;
+    # read() maps them onto the ring, which always holds the last max_seconds.
+
+    def __init__(self, samplerate=16000, channels=1, max_seconds=30, device=None, blocksize=0):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.device = device
+        self.blocksize = blocksize
+        self.capacity = int(samplerate * max_seconds)
+        self.buffer = np.zeros((self.capacity, channels), dtype=np.int16)
+        self.written = 0
+        self.start_frame = 0
+        self.full = threading.Event()
+        self._stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        if status:
+            print("⚠️", status)
+        # Stop at max_seconds: writing on would wrap the ring over the start
+        # of the recording, which is the part that must not be lost
+        room = self.start_frame + self.capacity - self.written
+        if room <= 0:
+            self.full.set()
+            return
+        if frames > room:
+            frames, indata = room, indata[:room]
+        pos = self.written % self.capacity
+        n = min(frames, self.capacity - pos)
+        self.buffer[pos:pos + n] = indata[:n]
+        if n < frames:
+            self.buffer[:frames - n] = indata[n:]
+        self.written += frames
+        if self.written - self.start_frame >= self.capacity:
+            self.full.set()
+
+    def start(self):
+        import sounddevice as sd
+        self.full.clear()
+        self.start_frame = self.written
+        self._stream = sd.InputStream(
+            samplerate=self.samplerate,
+            channels=self.channels,
+            dtype="int16",
+            device=self.device,
+            blocksize=self.blocksize,
+            callback=self._callback
+        )
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        return self.read(self.start_frame, self.written)
+
+    def read(self, start, end):
+        start = max(start, end - self.capacity)
+        if end <= start:
+            return np.zeros((0, self.channels), dtype=np.int16)
+        a, b = start % self.capacity, end % self.capacity
+        if a < b:
+            return self.buffer[a:b].copy()
+        return np.concatenate((self.buffer[a:], self.buffer[:b]))
+
+    def duration(self):
+        return (self.written - self.start_frame) / self.samplerate
+
+    def record(self, stop_event, poll=0.05, endpointer=None, on_start=None):
+        self.start()
+        if on_start:
+            on_start()
+        checked = self.start_frame
+        try:
+            while not stop_event.is_set() and not self.full.is_set():
+                stop_event.wait(poll)
+                if endpointer is not None:
+                    end = self.written
+                    if endpointer.feed(self.read(checked, end)):
+                        print("🔚 End of speech detected")
+                        break
+                    checked = end
+        finally:
+            pcm = self.stop()
+        if self.full.is_set():
+            print(f"⏹️ Reached max recording length ({self.capacity / self.samplerate:.0f}s)")
+        return pcm
+
+def find_input_device():
+    # First real microphone (skipping PulseAudio monitors and dummy devices) and
+    # its native rate; (None, 16000) means the system default device
+    import sounddevice as sd
+    try:
+        for idx, dev in enumerate(sd.query_devices()):
+            name = dev["name"].lower()
+            if dev["max_input_channels"] > 0 and "monitor" not in name and "dummy" not in name:
+                print(f"🎤 Selected input device: {dev['name']} (device #{idx})")
+                return idx, int(dev["default_samplerate"])
+    except Exception as e:
+        print("⚠️ Could not list input devices:", e)
+    print("⚠️ No suitable mic found. Using default.")
+    return None, WHISPER_SAMPLERATE
+
+def to_mono_float32(pcm, samplerate, target_rate=WHISPER_SAMPLERATE):
+    audio = pcm.astype(np.float32).mean(axis=1) / 32768.0 if pcm.ndim == 2 else pcm.astype(np.float32) / 32768.0
+    if samplerate != target_rate and len(audio):
+        audio = resample(audio, samplerate, target_rate)
+    return audio
+
+def resample(audio, samplerate, target_rate):
+    # soxr when installed (band-limited, and faster); otherwise linear
+    # interpolation, which is enough for speech going into Whisper
+    try:
+        import soxr
+        return soxr.resample(audio, samplerate, target_rate).astype(np.float32)
+    except ImportError:
+        n_out = int(len(audio) * target_rate / samplerate)
+        return np.interp(
+            np.arange(n_out) * (samplerate / target_rate),
+            np.arange(len(audio)),
+            audio
+        ).astype(np.float32)
+
+def wav_bytes(pcm, samplerate):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(pcm.shape[1] if pcm.ndim == 2 else 1)
+        w.setsampwidth(2)
+        w.setframerate(samplerate)
+        w.writeframes(pcm.astype(np.int16).tobytes())
+    return buf.getvalue()
+
+def save_wav(pcm, samplerate, path):
+    with open(path, "wb") as f:
+        f.write(wav_bytes(pcm, samplerate))
+    return path
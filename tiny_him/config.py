@@ -2,4 +2,169 @@ MODEL_SIZE = "base"
 OPENAI_MODEL = "gpt-4.1"
 LOCAL_LLM_PATH = "phi-2.Q4_K_M.gguf"
 SYSTEM_PROMPT = "You are a kind helper like Dobby in Harry Potter. Always answer concisely in English:\n"
-AUDIO_INPUT_PATH = "input.wav"
\ No newline at end of file
+AUDIO_INPUT_PATH = "input.wav"
+
+# GPIO
+GPIO_PIN_FACTORY = None         # None = gpiozero picks (lgpio on a Pi 5); "lgpio", "rpigpio", "native" (no PWM, not on a Pi 5) or "mock"
+BUTTON_PIN = 17
+LED_PIN = 18
+BUTTON_BOUNCE_TIME = 0.05
+BUTTON_LONG_PRESS = 1.0         # held this long -> long_press (cancels the interaction)
+BUTTON_DOUBLE_PRESS = 0.35
+
+# Local LLM engine: loaded once and kept resident between interactions
+LOCAL_LLM_N_CTX = 1024
+LOCAL_LLM_MAX_TOKENS = 200
+LOCAL_LLM_PRELOAD = True        # load at startup when running offline, otherwise on first query
+LOCAL_LLM_IDLE_UNLOAD = 600     # seconds without a query before the model is freed (0 = never)
+LOCAL_LLM_STATE_CACHE = True    # evaluate SYSTEM_PROMPT once and snapshot the KV cache to disk
+LOCAL_LLM_STATE_DIR = "llm_state"
+
+# Model manager (models.py): local models share one memory budget, LRU-evicted
+MODEL_MEMORY_BUDGET_MB = 2500   # all resident models together (Pi 5, 4 GB)
+MODEL_MIN_AVAILABLE_MB = 500    # MemAvailable to leave after a load, so nothing swaps
+MODEL_IDLE_UNLOAD = 600         # default seconds unused before a model is freed (0 = never)
+MODEL_PREFETCH_ON_PRESS = True  # start loading the models a press will need while recording
+
+# Streaming pipeline: speak each sentence of the reply as soon as it arrives
+STREAMING_PIPELINE = True
+STREAM_MIN_SENTENCE_CHARS = 20
+
+# Audio capture: "ringbuffer" (sounddevice, in memory), "arecord" (subprocess writing
+# AUDIO_INPUT_PATH) or "file" (read AUDIO_INPUT_PATH as a fixture, for benchmarks)
+CAPTURE_BACKEND = "ringbuffer"
+CAPTURE_SAMPLERATE = 16000
+CAPTURE_CHANNELS = 1
+CAPTURE_DEVICE = None           # sounddevice index or name substring, None = system default
+CAPTURE_MAX_SECONDS = 30
+CAPTURE_SAVE_WAV = False        # also write the capture to AUDIO_INPUT_PATH
+
+# Voice activity endpointing (ringbuffer capture only)
+VAD_ENABLED = True
+VAD_BACKEND = "energy"          # "energy" (numpy RMS + zero-crossing) or "webrtc" (needs webrtcvad)
+VAD_FRAME_MS = 30
+VAD_ENERGY_THRESHOLD = 0.01     # RMS as a fraction of full scale
+VAD_ZCR_MAX = 0.35
+VAD_CALIBRATION_MS = 300        # noise floor seeded from the quietest frames of this window
+VAD_NOISE_FLOOR_MAX = 0.02      # cap on the learnt noise floor (RMS), so speech always clears it
+VAD_WEBRTC_AGGRESSIVENESS = 2
+VAD_HANGOVER_MS = 800           # silence after speech before recording stops
+VAD_MIN_SPEECH_MS = 250
+VAD_NO_SPEECH_TIMEOUT = 5.0     # give up if nothing is said within this many seconds
+
+# Local speech-to-text engine (see stt_backends.py): "faster-whisper" (CTranslate2, int8)
+# or "whisper" (reference PyTorch, fp32). Model size is MODEL_SIZE.
+STT_BACKEND = "faster-whisper"
+STT_COMPUTE_TYPE = "int8"       # faster-whisper only: "int8", "int8_float32", "float32"
+STT_THREADS = 4                 # CPU threads for decoding, None = all cores
+STT_BEAM_SIZE = 1               # 1 = greedy decoding
+STT_LANGUAGE = "en"             # pinned language skips detection, None = detect
+STT_WORKERS = 2                 # faster-whisper decoders for segment transcription, each on STT_THREADS
+
+# Incremental local Whisper: transcribe while the user is still talking (offline, ringbuffer capture)
+STREAMING_STT = True
+STREAMING_STT_WINDOW = 15.0     # max seconds of uncommitted audio per pass
+STREAMING_STT_STEP = 1.0        # seconds between passes
+
+# Segment-parallel transcription (ringbuffer capture): the recording is cut at pauses and
+# each closed segment is transcribed while the user keeps talking, by concurrent cloud
+# requests or STT_WORKERS local decoders (one with reference Whisper). Takes over from STREAMING_STT on the local route.
+SEGMENT_STT = True
+SEGMENT_MIN_GAP_MS = 400        # pause that closes a segment
+SEGMENT_MIN_SECONDS = 4.0       # shorter segments keep growing (Whisper needs context)
+SEGMENT_MAX_SECONDS = 20.0      # cut here even without a pause
+SEGMENT_CLOUD_CONCURRENCY = 4
+
+# Cloud STT upload (upload_audio.py): downmixed, resampled to 16 kHz, silence-trimmed, compressed
+UPLOAD_PREPROCESS = True
+UPLOAD_FORMAT = "flac"          # "flac" (lossless), "opus" (smallest, lossy) or "wav"
+UPLOAD_TRIM_SILENCE = True
+UPLOAD_TRIM_PAD_MS = 200        # silence kept before and after the speech
+
+# TTS cache: clips keyed by hash of text, engine, voice and model, LRU-evicted past the byte budget
+TTS_CACHE_ENABLED = True
+TTS_CACHE_DIR = "tts_cache"
+TTS_CACHE_MAX_BYTES = 50 * 1024 * 1024
+TTS_CACHE_WARMUP = [
+    "I'm offline and unable to respond.",
+    "Sorry, something went wrong. Please try again.",
+]
+
+# Conversation history (conversation.py): recent turns within a token budget, older
+# turns compacted into a running summary in the background after playback
+HISTORY_ENABLED = True
+HISTORY_TOKEN_BUDGET = 1500     # recent turns (plus summary) sent to the cloud LLM
+HISTORY_LOCAL_TOKEN_BUDGET = 300  # the local LLM only has LOCAL_LLM_N_CTX tokens
+HISTORY_SUMMARY_MODEL = "gpt-4.1-mini"
+HISTORY_SUMMARY_WORDS = 120
+HISTORY_IDLE_RESET = 600        # seconds without a question before starting over (0 = never)
+
+# Offline TTS (tts_engines.py): PCM is piped from the engine into the player while it
+# renders, one sentence at a time, instead of writing a WAV per reply
+LOCAL_TTS_ENGINE = "espeak"     # "espeak" (espeak-ng or espeak) or "piper" (neural voice, needs piper-tts)
+LOCAL_TTS_STREAM = True         # play while rendering; False renders each clip whole first
+LOCAL_TTS_VOICE = None          # espeak voice (-v), e.g. "en-us"
+LOCAL_TTS_RATE = None           # espeak words per minute (-s)
+LOCAL_TTS_PIPER_MODEL = "en_US-lessac-low.onnx"
+LOCAL_TTS_CHUNK = 2048          # samples read from the engine at a time
+
+# Answer cache: repeated questions skip the LLM. Exact match on the normalized
+# transcript, plus cosine similarity over sentence-transformers embeddings when
+# ANSWER_CACHE_SEMANTIC is on. Answers are keyed on the conversation history
+# they were given in; mid-conversation, a question that doesn't look like a
+# follow-up also matches answers given without any history.
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_PATH = "answer_cache.json"
+ANSWER_CACHE_TTL = 24 * 3600
+# Questions whose answer depends on when they are asked are never cached
+ANSWER_CACHE_EXCLUDE = r"\b(time|date|day|today|tonight|tomorrow|yesterday|now|weather|forecast|temperature|news|latest|current|score)\b"
+ANSWER_CACHE_CONTEXT_FREE = True  # False: with history, only answers given in the same history match
+ANSWER_CACHE_FOLLOWUP = r"\b(it|its|that|this|these|those|they|them|their|he|him|his|she|her|there|then|else|more|again|also|same|one|ones|why|so)\b"
+ANSWER_CACHE_SAVE_DELAY = 30    # seconds; hit counters are written in batches
+ANSWER_CACHE_SEMANTIC = False
+ANSWER_CACHE_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+ANSWER_CACHE_SIMILARITY = 0.92
+
+# Playback: "stream" keeps one sounddevice output open and decodes in-process,
+# "subprocess" runs aplay/mpg123/afplay per clip, "null" discards audio (benchmarks)
+PLAYER_BACKEND = "stream"
+PLAYER_SAMPLERATE = 24000       # OpenAI TTS output rate; other clips are resampled
+PLAYER_DEVICE = None
+
+# OpenAI HTTP transport
+HTTP_HTTP2 = False              # needs the h2 package
+HTTP_MAX_CONNECTIONS = 4
+HTTP_KEEPALIVE_EXPIRY = 120     # seconds an idle pooled connection is kept
+HTTP_CONNECT_TIMEOUT = 3.0
+HTTP_READ_TIMEOUT = 30.0
+HTTP_MAX_RETRIES = 1
+HTTP_REFRESH_INTERVAL = 45      # re-warm the pool when idle this long (0 = off)
+
+# Interaction engine: asyncio pipeline with concurrent stages (pipeline.py) or
+# the sequential run_interaction (interaction.py)
+PIPELINE_ASYNC = True
+PIPELINE_QUEUE_SIZE = 2         # max sentences / clips buffered between stages
+
+# Barge-in: a press while processing or speaking cancels the reply and starts listening again
+BARGE_IN = True
+BARGE_IN_TIMEOUT = 2.0          # max seconds to wait for the old interaction to unwind
+
+# Latency metrics: per-stage histograms exported for node-exporter's textfile collector
+METRICS_ENABLED = True
+METRICS_WINDOW = 500            # samples per stage/backend for p50/p95/p99
+METRICS_TEXTFILE = "/var/lib/prometheus/node-exporter/pim.prom"
+METRICS_JSONL = "metrics.jsonl"
+
+# Connectivity monitor and per-stage circuit breakers
+HEALTH_PROBE_URL = "https://api.openai.com/v1"   # OPENAI_BASE_URL takes precedence
+HEALTH_INTERVAL = 15            # seconds between background probes
+HEALTH_PROBE_TIMEOUT = 2.0
+BREAKER_FAILURES = 2            # consecutive failures before a stage is routed locally
+BREAKER_RESET_TIMEOUT = 30      # seconds before an open stage is tried online again
+
+# Hedged requests (Pi 5 only: needs the local backends)
+HEDGE_ENABLED = True
+HEDGE_STAGES = ("stt", "llm")   # stages where a slow cloud call also starts the local backend
+HEDGE_PERCENTILE = 0.95         # start the local backend once the cloud call passes this percentile
+HEDGE_MIN_SAMPLES = 10          # cloud samples needed before the percentile is trusted
+HEDGE_DEFAULT_DEADLINE = 4.0    # seconds, used until there are enough samples
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import threading
+import time
+
+import config
+
+# Multi-turn history for follow-up questions. Recent turns are sent verbatim
+# as long as they fit the token budget of the LLM in use (the local one has a
+# much smaller one); once they outgrow it, the oldest ones are folded into a
+# running summary by a background call after playback, so the prompt (and
+# with it LLM latency) stays roughly the same size however long the session
+# runs. A long enough pause starts a fresh conversation.
+
+_lock = threading.Lock()
+_turns = []            # [{"user", "assistant", "tokens"}], oldest first
+_summary = ""
+_last_turn = 0.0
+_compacting = False
+_encoding = None
+
+def count_tokens(text):
+    # tiktoken's count for the cloud model; about four characters per token without it
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(config.OPENAI_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+def _expire():
+    global _summary
+    if config.HISTORY_IDLE_RESET and _turns and time.time() - _last_turn > config.HISTORY_IDLE_RESET:
+        _turns.clear()
+        _summary = ""
+        print("🧹 New conversation")
+
+def _recent(budget):
+    # Newest turns that fit the budget, in chronological order
+    with _lock:
+        _expire()
+        summary = _summary
+        chosen = []
+        used = count_tokens(summary) if summary else 0
+        for turn in reversed(_turns):
+            if used + turn["tokens"] > budget:
+                break
+            chosen.append(turn)
+            used += turn["tokens"]
+    return summary, chosen[::-1]
+
+def is_fresh():
+    # No earlier turns to interpret the question against
+    return not digest()
+
+def digest():
+    # Identifies the history a question is asked against, "" when there is
+    # none; the answer cache keys answers on it
+    if not config.HISTORY_ENABLED:
+        return ""
+    with _lock:
+        _expire()
+        if not _turns and not _summary:
+            return ""
+        history = [_summary] + [[t["user"], t["assistant"]] for t in _turns]
+    return hashlib.sha256(json.dumps(history).encode("utf-8")).hexdigest()[:16]
+
+def messages(system_prompt, user_input):
+    # Chat messages for the cloud LLM
+    if not config.HISTORY_ENABLED:
+        return [{"role": "user", "content": system_prompt + user_input}]
+    summary, turns = _recent(config.HISTORY_TOKEN_BUDGET)
+    system = system_prompt.strip()
+    if summary:
+        system = (system + "\n\n" if system else "") + "Summary of the conversation so far: " + summary
+    result = [{"role": "system", "content": system}] if system else []
+    for turn in turns:
+        result.append({"role": "user", "content": turn["user"]})
+        result.append({"role": "assistant", "content": turn["assistant"]})
+    result.append({"role": "user", "content": user_input})
+    return result
+
+def prompt(system_prompt, user_input):
+    # Plain-text prompt for the local LLM. It always starts with system_prompt,
+    # so the state llm_engine primed for it (complete(system_prompt=...)) applies.
+    if not config.HISTORY_ENABLED:
+        return system_prompt + user_input
+    summary, turns = _recent(config.HISTORY_LOCAL_TOKEN_BUDGET)
+    lines = []
+    if summary:
+        lines.append(f"Earlier: {summary}")
+    for turn in turns:
+        lines.append(f"User: {turn['user']}")
+        lines.append(f"You: {turn['assistant']}")
+    if not lines:
+        return system_prompt + user_input
+    return system_prompt + "\n".join(lines) + f"\nUser: {user_input}\nYou:"
+
+def add_turn(user_input, reply):
+    global _last_turn
+    if not config.HISTORY_ENABLED or not user_input or not reply:
+        return
+    with _lock:
+        _expire()
+        _turns.append({
+            "user": user_input,
+            "assistant": reply,
+            "tokens": count_tokens(user_input) + count_tokens(reply),
+        })
+        _last_turn = time.time()
+
+def _budget(online):
+    return config.HISTORY_TOKEN_BUDGET if online else config.HISTORY_LOCAL_TOKEN_BUDGET
+
+def _summary_tokens():
+    return count_tokens(_summary) if _summary else 0
+
+def _summarize(client, summary, turns, online):
+    transcript = "\n".join(f"User: {t['user']}\nAssistant: {t['assistant']}" for t in turns)
+    request = (
+        f"Update the running summary of a voice conversation with the exchanges below. "
+        f"Keep names, facts and open questions the user may refer back to; at most "
+        f"{config.HISTORY_SUMMARY_WORDS} words, plain text.\n\n"
+        f"Current summary: {summary or '(none)'}\n\nNew exchanges:\n{transcript}"
+    )
+    if online:
+        response = client.chat.completions.create(
+            model=config.HISTORY_SUMMARY_MODEL,
+            messages=[{"role": "user", "content": request}]
+        )
+        return response.choices[0].message.content.strip()
+    # Yields to the next interaction; None means try again after a later turn
+    import llm_engine
+    return llm_engine.complete(request + "\nSummary:", max_tokens=config.HISTORY_SUMMARY_WORDS * 2, background=True)
+
+def _compact(client, online):
+    global _summary, _compacting
+    try:
+        budget = _budget(online)
+        with _lock:
+            total = sum(t["tokens"] for t in _turns)
+            # Fold turns until what's left is within half of what the summary
+            # leaves of the budget, so this runs every few turns rather than
+            # after each one. The local LLM folds at most a budget's worth at
+            # a time to fit its context.
+            keep = max(0, budget - _summary_tokens()) // 2
+            older = []
+            folded = 0
+            for turn in _turns:
+                if total <= keep or (not online and older and folded + turn["tokens"] > budget):
+                    break
+                older.append(turn)
+                folded += turn["tokens"]
+                total -= turn["tokens"]
+            summary = _summary
+        if not older:
+            return
+        start = time.perf_counter()
+        new_summary = _summarize(client, summary, older, online)
+        if new_summary is None:
+            print("🗜️ Compaction postponed, the local LLM is needed")
+            return
+        with _lock:
+            # Turns added meanwhile stay; a reset meanwhile discards this summary
+            if _turns[:len(older)] == older:
+                del _turns[:len(older)]
+                _summary = new_summary
+        print(f"🗜️ Compacted {len(older)} turns into the summary in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        print("⚠️ Conversation compaction failed:", e)
+    finally:
+        _compacting = False
+
+def compact_async(client, online=None):
+    # Call once playback has finished, so the summary request never competes
+    # with the interaction for CPU or bandwidth. online is the LLM route in
+    # use (default: what the health monitor picks); its budget sets when to
+    # compact, so no turn falls out of the local prompt without being summarized.
+    global _compacting
+    if not config.HISTORY_ENABLED:
+        return
+    if online is None:
+        import health
+        online = health.use_online("llm")
+    with _lock:
+        if _compacting or _summary_tokens() + sum(t["tokens"] for t in _turns) <= _budget(online):
+            return
+        _compacting = True
+    threading.Thread(target=_compact, args=(client, online), daemon=True).start()
+
+def reset():
+    global _summary
+    with _lock:
+        _turns.clear()
+        _summary = ""
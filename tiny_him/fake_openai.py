@@ -0,0 +1,123 @@
+import io
+import json
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the OpenAI transcription, chat and speech endpoints with
+# configurable latency, used by benchmark.py to drive the pipeline headless.
+
+class FakeOpenAIConfig:
+    def __init__(self, stt_latency=0.3, ttft=0.4, token_delay=0.02, tts_latency=0.25,
+                 transcript="What is the tallest mountain in the world?",
+                 reply="The tallest mountain is Mount Everest. It is about 8849 metres high. "
+                       "It sits on the border of Nepal and China."):
+        self.stt_latency = stt_latency
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.tts_latency = tts_latency
+        self.transcript = transcript
+        self.reply = reply
+
+def _silence_wav(seconds=0.5, samplerate=24000):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(samplerate)
+        w.writeframes(b"\x00\x00" * int(seconds * samplerate))
+    return buf.getvalue()
+
+def make_handler(cfg):
+    speech = _silence_wav()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def handle(self):
+            # Clients may drop a keep-alive connection mid-stream (e.g. on barge-in)
+            try:
+                super().handle()
+            except (ConnectionResetError, BrokenPipeError):
+                pass
+
+        def _send(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            self._send(200, b"{}", "application/json")
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.endswith("/audio/transcriptions"):
+                time.sleep(cfg.stt_latency)
+                self._send(200, json.dumps({"text": cfg.transcript}).encode(), "application/json")
+            elif self.path.endswith("/chat/completions"):
+                request = json.loads(body or b"{}")
+                if request.get("stream"):
+                    self._stream_chat(request)
+                else:
+                    time.sleep(cfg.ttft + cfg.token_delay * len(cfg.reply.split()))
+                    self._send(200, json.dumps(self._completion(request)).encode(), "application/json")
+            elif self.path.endswith("/audio/speech"):
+                time.sleep(cfg.tts_latency)
+                self._send(200, speech, "audio/wav")
+            else:
+                self._send(404, b"{}", "application/json")
+
+        def _completion(self, request):
+            return {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "bench"),
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": cfg.reply},
+                }],
+            }
+
+        def _stream_chat(self, request):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(cfg.ttft)
+            for i, word in enumerate(cfg.reply.split(" ")):
+                chunk = {
+                    "id": "chatcmpl-bench",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request.get("model", "bench"),
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+                }
+                self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                time.sleep(cfg.token_delay)
+            self._chunk(b"data: [DONE]\n\n")
+            self._chunk(b"")
+
+        def _chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+def start_server(cfg, host="127.0.0.1", port=0):
+    server = ThreadingHTTPServer((host, port), make_handler(cfg))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
@@ -1,40 +1,132 @@
-from gpiozero import Button, LED
+from gpiozero import Button, Device, LED
 import threading
 import time
 import atexit
-import RPi.GPIO as GPIO
+import queue
+from collections import namedtuple
 
-button = Button(17, pull_up=True, bounce_time=0.1)
-led = LED(18)
+import config
+import metrics
+
+def select_pin_factory(name):
+    # "native", "lgpio", "rpigpio", "mock", or None for gpiozero's own default
+    if name == "native":
+        from gpiozero.pins.native import NativeFactory as Factory
+    elif name == "lgpio":
+        from gpiozero.pins.lgpio import LGPIOFactory as Factory
+    elif name == "rpigpio":
+        from gpiozero.pins.rpigpio import RPiGPIOFactory as Factory
+    elif name == "mock":
+        from gpiozero.pins.mock import MockFactory as Factory
+    else:
+        return
+    Device.pin_factory = Factory()
+
+select_pin_factory(config.GPIO_PIN_FACTORY)
+pin_factory_name = config.GPIO_PIN_FACTORY or "default"
+
+button = Button(
+    config.BUTTON_PIN,
+    pull_up=True,
+    bounce_time=config.BUTTON_BOUNCE_TIME,
+    hold_time=config.BUTTON_LONG_PRESS
+)
+led = LED(config.LED_PIN)
 state = "idle"
 running = True
 
-def set_state(new_state):
-    global state
-    state = new_state
-    print(f"🔁 State: {state}")
+# ========== BUTTON EVENTS ==========
+
+# Edge callbacks push gestures onto a queue, so presses made while the
+# consumer is busy are kept instead of dropped. "press" fires on the edge. A
+# second press within BUTTON_DOUBLE_PRESS seconds comes as "double_press"
+# instead; the first one has already been delivered as a press, so a consumer
+# acting on double_press first undoes what that press started. "long_press"
+# follows a press held for BUTTON_LONG_PRESS seconds.
+ButtonEvent = namedtuple("ButtonEvent", ["kind", "at"])
+button_events = queue.Queue()
+_last_press_at = None
+
+def _on_pressed():
+    global _last_press_at
+    latency = button.active_time or 0.0
+    at = time.perf_counter() - latency
+    metrics.record("press_to_callback", latency, backend=pin_factory_name)
+    metrics.mark("press", at, backend=pin_factory_name)
+    if _last_press_at is not None and at - _last_press_at < config.BUTTON_DOUBLE_PRESS:
+        _last_press_at = None
+        button_events.put(ButtonEvent("double_press", at))
+    else:
+        _last_press_at = at
+        button_events.put(ButtonEvent("press", at))
+
+def _on_held():
+    button_events.put(ButtonEvent("long_press", time.perf_counter()))
+
+button.when_pressed = _on_pressed
+button.when_held = _on_held
+
+# Each pattern is a list of (led on, seconds) steps; None holds until the next
+# state change. The LED thread sleeps on a condition variable, so a transition
+# shows up immediately and a steady state costs no wake-ups. How long the LED
+# took to follow set_state() is recorded as the "led" stage, per state.
+# The top-level scripts drive the same LED and button through this module.
+LED_PATTERNS = {
+    "idle": ([(False, None)], False),
+    "ready": ([(True, None)], False),
+    "listening": ([(True, 0.1), (False, 0.1)], True),
+    "processing": ([(True, 0.5), (False, 0.5)], True),
+    "speaking": ([(True, 0.1), (False, 0.1)] * 3 + [(True, None)], False),
+}
+LED_OFF = ([(False, None)], False)
+
+state_changed = threading.Condition()
+state_version = 0
+state_changed_at = time.perf_counter()
+
+def _wait_for_change(seen, timeout):
+    with state_changed:
+        return state_changed.wait_for(lambda: state_version != seen or not running, timeout)
 
 def led_loop():
-    global state
     while running:
-        if state == "idle":
-            led.off(); time.sleep(5); led.on(); time.sleep(0.1); led.off()
-        elif state == "ready":
-            led.on(); time.sleep(0.2)
-        elif state == "listening":
-            led.toggle(); time.sleep(0.1)
-        elif state == "processing":
-            led.toggle(); time.sleep(0.5)
-        elif state == "speaking":
-            for _ in range(3): led.on(); time.sleep(0.1); led.off(); time.sleep(0.1)
-            state = "ready"
-        else:
-            led.off(); time.sleep(0.1)
+        with state_changed:
+            current, seen, changed_at = state, state_version, state_changed_at
+        steps, repeat = LED_PATTERNS.get(current, LED_OFF)
+        first = True
+        changed = False
+        while not changed:
+            for on, duration in steps:
+                if on:
+                    led.on()
+                else:
+                    led.off()
+                if first:
+                    first = False
+                    metrics.record("led", time.perf_counter() - changed_at, backend=current)
+                changed = _wait_for_change(seen, duration)
+                if changed:
+                    break
+            if not repeat and not changed:
+                changed = _wait_for_change(seen, None)
+
+def set_state(new_state):
+    global state, state_version, state_changed_at
+    with state_changed:
+        state = new_state
+        state_version += 1
+        state_changed_at = time.perf_counter()
+        state_changed.notify_all()
+    print(f"🔁 State: {state}")
 
 def start_led_thread():
     threading.Thread(target=led_loop, daemon=True).start()
 
 def cleanup_gpio():
-    GPIO.cleanup()
+    try:
+        import RPi.GPIO as GPIO
+        GPIO.cleanup()
+    except ImportError:
+        pass
 
 atexit.register(cleanup_gpio)
\ No newline at end of file
@@ -0,0 +1,194 @@
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import barge_in
+import config
+import hedge
+
+# Background reachability checks against the API host plus one circuit breaker
+# per cloud stage. Each interaction asks plan() which stages should go online;
+# a stage whose breaker is open, or any stage while the API is unreachable,
+# goes straight to its local backend instead of waiting out a timeout.
+
+STAGES = ("stt", "llm", "tts")
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=2, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self):
+        return self.state != "open"
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                print(f"🟢 {self.name} circuit closed")
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.trip()
+
+    def trip(self):
+        if self.state != "open":
+            print(f"🔴 {self.name} circuit open")
+        self.opened_at = time.monotonic()
+
+    def half_open(self):
+        # Skips the rest of the cooldown: the next call is the trial, and
+        # closes the breaker or trips it again
+        with self._lock:
+            if self.state == "open":
+                print(f"🟡 {self.name} circuit half-open")
+                self.opened_at = time.monotonic() - self.reset_timeout
+
+breakers = {
+    stage: CircuitBreaker(stage, config.BREAKER_FAILURES, config.BREAKER_RESET_TIMEOUT)
+    for stage in STAGES
+}
+local_available = dict.fromkeys(STAGES, False)
+online = True
+last_probe = None
+_monitor = None
+
+def api_address():
+    url = urlparse(os.environ.get("OPENAI_BASE_URL") or config.HEALTH_PROBE_URL)
+    return url.hostname, url.port or (443 if url.scheme == "https" else 80)
+
+def probe():
+    # A per-socket timeout; the process-wide default is left alone
+    try:
+        with socket.create_connection(api_address(), timeout=config.HEALTH_PROBE_TIMEOUT):
+            return True
+    except OSError:
+        return False
+
+def check():
+    global online, last_probe
+    reachable = probe()
+    last_probe = time.time()
+    if reachable != online:
+        print("📶 API reachable" if reachable else "📴 API unreachable")
+    # An outage trips every breaker; once the API answers again they go
+    # half-open rather than keeping the stages local for the whole cooldown
+    for breaker in breakers.values():
+        if not reachable:
+            breaker.trip()
+        elif not online:
+            breaker.half_open()
+    online = reachable
+    return reachable
+
+def _monitor_loop():
+    while True:
+        time.sleep(config.HEALTH_INTERVAL)
+        check()
+
+def start_monitor():
+    global _monitor
+    check()
+    if _monitor is None:
+        _monitor = threading.Thread(target=_monitor_loop, daemon=True)
+        _monitor.start()
+
+def use_online(stage):
+    if not local_available[stage]:
+        return True
+    return online and breakers[stage].allow()
+
+def local_stages():
+    # Stages that may run on their local backend next: routed there, or hedged
+    return [s for s in STAGES if local_available[s] and (not use_online(s) or hedge.enabled(s))]
+
+def plan():
+    routes = {stage: use_online(stage) for stage in STAGES}
+    print("🧭 Routing: " + ", ".join(f"{s}={'online' if o else 'local'}" for s, o in routes.items()))
+    return routes
+
+def backend_label(routes):
+    if all(routes.values()):
+        return "online"
+    return "mixed" if any(routes.values()) else "local"
+
+def _can_fall_back(stage, local_fn):
+    return local_fn is not None and local_available[stage]
+
+def _guarded(stage, online_fn):
+    try:
+        result = online_fn()
+    except Exception:
+        if not barge_in.cancelled():
+            breakers[stage].record_failure()
+        raise
+    breakers[stage].record_success()
+    return result
+
+def _guarded_stream(stage, online_fn):
+    try:
+        yield from online_fn()
+    except Exception:
+        if not barge_in.cancelled():
+            breakers[stage].record_failure()
+        raise
+    breakers[stage].record_success()
+
+def _serve(served, stage, backend):
+    if served is not None:
+        served[stage] = backend
+
+def call(stage, online_fn, local_fn, prefer_online=True, served=None):
+    # served, if given, gets served[stage] = "online" / "local": the backend
+    # that actually answered, which differs from the plan after a fallback
+    if prefer_online and hedge.enabled(stage) and _can_fall_back(stage, local_fn):
+        return hedge.call(stage, lambda: _guarded(stage, online_fn), local_fn, served)
+    if prefer_online:
+        try:
+            result = _guarded(stage, online_fn)
+            _serve(served, stage, "online")
+            return result
+        except Exception as e:
+            if barge_in.cancelled() or not _can_fall_back(stage, local_fn):
+                raise
+            print(f"⚠️ Online {stage} failed ({e}), using local")
+    _serve(served, stage, "local")
+    return local_fn()
+
+def stream(stage, online_fn, local_fn, prefer_online=True, served=None):
+    # Like call() for generators; only falls back if nothing was yielded yet
+    if prefer_online and hedge.enabled(stage) and _can_fall_back(stage, local_fn):
+        yield from hedge.stream(stage, lambda: _guarded_stream(stage, online_fn), local_fn, served)
+        return
+    if prefer_online:
+        started = False
+        try:
+            for item in _guarded_stream(stage, online_fn):
+                if not started:
+                    started = True
+                    _serve(served, stage, "online")
+                yield item
+            return
+        except Exception as e:
+            if started or barge_in.cancelled() or not _can_fall_back(stage, local_fn):
+                raise
+            print(f"⚠️ Online {stage} failed ({e}), using local")
+    _serve(served, stage, "local")
+    yield from local_fn()
@@ -0,0 +1,183 @@
+import contextvars
+import queue
+import threading
+import time
+
+import barge_in
+import config
+import metrics
+
+# Hedged requests: the cloud call runs first, and if it hasn't answered by the
+# configured percentile of its recent latencies the local backend starts next
+# to it. Whichever answers first wins and the other is abandoned: its thread is
+# marked lost (the local LLM stops at the next token, a cloud stream is closed
+# at the next chunk; a blocking HTTP request or Whisper pass just runs out in
+# the background and its result is dropped). Wins are counted per stage.
+
+# Which online samples set the deadline for each stage
+DEADLINE_METRIC = {"stt": "stt", "llm": "llm_total", "tts": "tts"}
+STREAM_DEADLINE_METRIC = {"llm": "llm_ttft"}
+POLL_INTERVAL = 0.1
+
+_workers = {}          # thread ident -> _Contender, for cancelled()
+
+def enabled(stage):
+    return config.HEDGE_ENABLED and stage in config.HEDGE_STAGES
+
+def deadline(stage, metric=None):
+    values = metrics.samples(metric or DEADLINE_METRIC[stage], "online")
+    if len(values) < config.HEDGE_MIN_SAMPLES:
+        return config.HEDGE_DEFAULT_DEADLINE
+    return metrics.percentile(values, config.HEDGE_PERCENTILE)
+
+def cancelled():
+    # True inside a worker whose race has already been decided against it
+    contender = _workers.get(threading.get_ident())
+    return contender is not None and contender.lost
+
+def win_rates():
+    # stage -> {winner: share of races}, winner "online" / "local" / "unhedged"
+    counts = {}
+    for labels, count in metrics.counters("hedge").items():
+        labels = dict(labels)
+        counts.setdefault(labels["stage"], {})[labels["winner"]] = count
+    return {
+        stage: {winner: count / sum(wins.values()) for winner, count in wins.items()}
+        for stage, wins in counts.items()
+    }
+
+class _Contender:
+    def __init__(self, name, results):
+        self.name = name
+        self.results = results
+        self.thread = None
+        self.lost = False
+        self.failed = False
+        self.finished = False
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.thread is not None and not self.finished
+
+    def start(self, target):
+        # In a copy of the caller's context, so the interaction's barge-in token applies
+        self.thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run, target), daemon=True)
+        self.thread.start()
+
+    def _run(self, target):
+        ident = threading.get_ident()
+        _workers[ident] = self
+        try:
+            target(self)
+        except Exception as e:
+            self.results.put((self.name, "error", e))
+        finally:
+            with self._lock:
+                self.finished = True
+                _workers.pop(ident, None)
+                metrics.attach(ident)
+
+    def lose(self):
+        with self._lock:
+            self.lost = True
+            if self.running:
+                metrics.detach(self.thread.ident)
+
+def _next(results, timeout=None):
+    # Blocks for the next result, but gives up as soon as barge-in fires
+    end = None if timeout is None else time.monotonic() + timeout
+    while True:
+        if barge_in.cancelled():
+            raise InterruptedError("interaction aborted")
+        wait = POLL_INTERVAL if end is None else min(POLL_INTERVAL, end - time.monotonic())
+        if wait <= 0:
+            raise queue.Empty
+        try:
+            return results.get(timeout=wait)
+        except queue.Empty:
+            continue
+
+def _race(stage, start_online, start_local, limit, served):
+    # Yields (kind, value) from whoever answers first, kind being "item" or
+    # "done". A cloud error before the deadline starts the local side at once.
+    # The winner's name goes into served[stage] when a dict is given.
+    results = queue.Queue()
+    online = _Contender("online", results)
+    local = _Contender("local", results)
+    started_at = time.perf_counter()
+    winner = None
+    online.start(start_online)
+    try:
+        while True:
+            try:
+                timeout = None if local.thread else limit - (time.perf_counter() - started_at)
+                name, kind, value = _next(results, timeout)
+            except queue.Empty:
+                print(f"⏱️ Online {stage} slower than {limit:.2f}s, starting local")
+                local.start(start_local)
+                continue
+            contender = online if name == "online" else local
+            if winner is None and kind == "error":
+                contender.failed = True
+                if contender is online and local.thread is None:
+                    print(f"⚠️ Online {stage} failed ({value}), using local")
+                    local.start(start_local)
+                    continue
+                other = local if contender is online else online
+                if not other.failed:
+                    continue
+                raise value
+            if winner is None:
+                winner = contender
+                if served is not None:
+                    served[stage] = name
+                hedged = local.thread is not None
+                (local if winner is online else online).lose()
+                label = name if hedged else "unhedged"
+                metrics.increment("hedge", stage=stage, winner=label)
+                metrics.note("hedge", **{stage: label})
+                if hedged:
+                    print(f"🏁 {stage}: {name} won after {time.perf_counter() - started_at:.2f}s")
+            if contender is not winner:
+                continue
+            if kind == "error":
+                raise value
+            yield kind, value
+            if kind == "done":
+                return
+    finally:
+        # Also stops the winner if the caller gave up early (barge-in, closed stream)
+        online.lose()
+        local.lose()
+
+def _call_target(fn):
+    def target(contender):
+        contender.results.put((contender.name, "done", fn()))
+    return target
+
+def _stream_target(fn):
+    def target(contender):
+        items = fn()
+        try:
+            for item in items:
+                if cancelled():
+                    break
+                contender.results.put((contender.name, "item", item))
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+        contender.results.put((contender.name, "done", None))
+    return target
+
+def call(stage, online_fn, local_fn, served=None):
+    for kind, value in _race(stage, _call_target(online_fn), _call_target(local_fn), deadline(stage), served):
+        return value
+
+def stream(stage, online_fn, local_fn, served=None):
+    # The deadline applies to the first item (time to first token)
+    limit = deadline(stage, STREAM_DEADLINE_METRIC.get(stage))
+    for kind, value in _race(stage, _stream_target(online_fn), _stream_target(local_fn), limit, served):
+        if kind == "item":
+            yield value
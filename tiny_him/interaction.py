@@ -1,23 +1,73 @@
-from io_audio import record_audio_interactive, play_audio
+from io_audio import capture_audio, play_audio, wait_for_playback
 from gpio_handler import set_state
+import barge_in
+import conversation
+import health
+import metrics
+import stages
 import threading
+import time
+
+def run_interaction(client, config, stop_event, whisper_model=None, online=None, token=None):
+    # online=None routes each stage through the health monitor; True/False forces all stages.
+    # token is the interaction's barge-in token; a fresh one when not given.
+    barge_in.bind(token or barge_in.begin())
+    routes = health.plan() if online is None else dict.fromkeys(health.STAGES, online)
+    metrics.start_interaction(health.backend_label(routes))
+    try:
+        _run_interaction(client, config, stop_event, whisper_model, routes)
+    finally:
+        metrics.finish_interaction(cancelled=barge_in.cancelled())
+
+def _first_audio(captured_at):
+    metrics.record("first_audio", time.perf_counter() - captured_at)
+    set_state("speaking")
+
+def _run_interaction(client, config, stop_event, whisper_model, routes):
+    from stream_stt import live_transcriber
 
-def run_interaction(client, config, stop_event, whisper_model=None, online=True):
     set_state("listening")
-    record_audio_interactive(config.AUDIO_INPUT_PATH, stop_event)
+    barge_in.report_listening()
+    transcriber = live_transcriber(client, config, routes["stt"], whisper_model)
+    audio = capture_audio(config, stop_event, on_start=transcriber.start if transcriber else None)
+    if audio is None or barge_in.cancelled():
+        if transcriber:
+            transcriber.cancel()
+        set_state("ready")
+        return
 
     set_state("processing")
-    if online:
-        from online_logic import transcribe_audio, query_chatgpt, synthesize_speech_openai
-        user_text = transcribe_audio(client, config.AUDIO_INPUT_PATH)
-        reply_text = query_chatgpt(client, user_text, config.OPENAI_MODEL, config.SYSTEM_PROMPT)
-        audio_path = synthesize_speech_openai(client, reply_text)
-    else:
-        from offline_logic import transcribe_audio_local, query_local_llm, synthesize_speech_local
-        user_text = transcribe_audio_local(whisper_model, config.AUDIO_INPUT_PATH)
-        reply_text = query_local_llm(user_text, config.LOCAL_LLM_PATH, config.SYSTEM_PROMPT)
-        audio_path = synthesize_speech_local(reply_text)
+    captured_at = time.perf_counter()
+    user_text = stages.transcribe(client, config, audio, routes, whisper_model, transcriber)
+    synthesize = lambda text: stages.synthesize(client, text, routes)
+    context, cached = stages.cached_reply(user_text)
+    served = {}
 
-    set_state("speaking")
+    # Local replies arrive whole but are still spoken sentence by sentence
+    if config.STREAMING_PIPELINE:
+        from streaming import sentence_chunks, speak_streamed
+        deltas = iter([cached]) if cached else stages.reply_deltas(client, config, user_text, routes, served)
+        reply_text = speak_streamed(
+            sentence_chunks(deltas, config.STREAM_MIN_SENTENCE_CHARS),
+            synthesize,
+            lambda path: play_audio(path, wait=False),
+            on_first_audio=lambda: _first_audio(captured_at)
+        )
+        if not barge_in.cancelled():
+            stages.remember(user_text, reply_text, served, context, cached)
+        wait_for_playback()
+        conversation.compact_async(client, routes["llm"])
+        set_state("ready")
+        return
+
+    reply_text = cached or stages.reply(client, config, user_text, routes, served)
+    audio_path = synthesize(reply_text)
+
+    if barge_in.cancelled():
+        set_state("ready")
+        return
+    stages.remember(user_text, reply_text, served, context, cached)
+    _first_audio(captured_at)
     play_audio(audio_path)
-    set_state("ready")
\ No newline at end of file
+    conversation.compact_async(client, routes["llm"])
+    set_state("ready")
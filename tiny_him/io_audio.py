@@ -4,12 +4,92 @@ import time
 import platform
 import os
 
+import config
+import metrics
+
 IS_MAC = platform.system() == "Darwin"
 
-def record_audio_interactive(output_path="input.wav", stop_event=None):
+_capture = None
+_vad = None
+_player = None
+_proc = None
+_speech = None
+
+def get_capture(config):
+    global _capture
+    if _capture is None:
+        from capture import AudioCapture
+        _capture = AudioCapture(
+            samplerate=config.CAPTURE_SAMPLERATE,
+            channels=config.CAPTURE_CHANNELS,
+            max_seconds=config.CAPTURE_MAX_SECONDS,
+            device=config.CAPTURE_DEVICE
+        )
+    return _capture
+
+def new_endpointer(config, samplerate=None):
+    global _vad
+    if not config.VAD_ENABLED:
+        return None
+    from vad import Endpointer, load_vad
+    if _vad is None:
+        _vad = load_vad(config)
+    return Endpointer(
+        _vad,
+        samplerate or config.CAPTURE_SAMPLERATE,
+        frame_ms=config.VAD_FRAME_MS,
+        hangover_ms=config.VAD_HANGOVER_MS,
+        min_speech_ms=config.VAD_MIN_SPEECH_MS,
+        no_speech_timeout=config.VAD_NO_SPEECH_TIMEOUT
+    )
+
+def capture_audio(config, stop_event, on_start=None):
+    # Returns either a WAV path (arecord backend) or int16 PCM from the ring buffer.
+    # Returns None when VAD is on and nothing was said.
+    def started():
+        metrics.record_since("press_to_record", "press")
+        if on_start:
+            on_start()
+
+    if config.CAPTURE_BACKEND == "arecord":
+        with metrics.timer("capture"):
+            record_audio_interactive(config.AUDIO_INPUT_PATH, stop_event, on_start=started)
+        return config.AUDIO_INPUT_PATH
+    if config.CAPTURE_BACKEND == "file":
+        return read_wav(config.AUDIO_INPUT_PATH, config.CAPTURE_SAMPLERATE)
+
+    print("🎤 Recording into ring buffer...")
+    endpointer = new_endpointer(config)
+    with metrics.timer("capture"):
+        pcm = get_capture(config).record(stop_event, endpointer=endpointer, on_start=started)
+    print(f"🎙️ Captured {len(pcm) / config.CAPTURE_SAMPLERATE:.1f}s of audio")
+    if endpointer is not None and not endpointer.speech_detected:
+        print("🤫 No speech detected, skipping")
+        return None
+    if config.CAPTURE_SAVE_WAV:
+        from capture import save_wav
+        save_wav(pcm, config.CAPTURE_SAMPLERATE, config.AUDIO_INPUT_PATH)
+        print(f"💾 Audio saved to {config.AUDIO_INPUT_PATH}")
+    return pcm
+
+def read_wav(path, samplerate):
+    # Fixture input for headless runs: the WAV is handed over as if just
+    # captured, converted to the capture format (mono int16 at samplerate)
+    import wave
+    import numpy as np
+    from capture import to_mono_float32
+    with wave.open(path, "rb") as w:
+        pcm = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16).reshape(-1, w.getnchannels())
+        rate = w.getframerate()
+    audio = to_mono_float32(pcm, rate, target_rate=samplerate)
+    return (audio * 32767).astype(np.int16).reshape(-1, 1)
+
+def record_audio_interactive(output_path="input.wav", stop_event=None, on_start=None):
     print("🎤 Recording with arecord...")
     cmd = ["arecord", "-D", "plughw:2,0", "-f", "cd", output_path]
     proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if on_start:
+        on_start()
     try:
         while not stop_event.is_set():
             time.sleep(0.1)
@@ -18,11 +98,97 @@ def record_audio_interactive(output_path="input.wav", stop_event=None):
         proc.wait()
         print(f"💾 Audio saved to {output_path}")
 
-def play_audio(path):
+def get_player():
+    global _player
+    if _player is None:
+        from player import AudioPlayer
+        _player = AudioPlayer(samplerate=config.PLAYER_SAMPLERATE, device=config.PLAYER_DEVICE)
+        _player.start()
+    return _player
+
+def _record_playback_start():
+    if _player is not None and _player.last_start_latency is not None:
+        metrics.record("playback_start", _player.last_start_latency)
+        _player.last_start_latency = None
+
+def wait_for_playback():
+    if _player is not None:
+        _player.wait()
+        _record_playback_start()
+
+def stop_playback():
+    # The stream first, so no more of it is queued after the flush
+    speech = _speech
+    if speech is not None:
+        speech.close()
+    if _player is not None:
+        _player.flush()
+    proc = _proc
+    if proc is not None and proc.poll() is None:
+        proc.terminate()
+
+def play_audio(path, wait=True):
+    # path is a clip file, or a tts_engines.SpeechStream played as it renders
+    global _proc
     print(f"🔊 Playing: {path}")
+    if not isinstance(path, str):
+        return _play_stream(path, wait)
+    if config.PLAYER_BACKEND == "null":
+        return
+    if config.PLAYER_BACKEND == "stream":
+        try:
+            get_player().play_file(path, wait=wait)
+            if wait:
+                _record_playback_start()
+            return
+        except Exception as e:
+            print("⚠️ In-process playback failed, falling back to subprocess:", e)
     if IS_MAC:
-        subprocess.run(["afplay", path])
+        cmd = ["afplay", path]
     elif path.endswith(".wav"):
-        subprocess.run(["aplay", path])
+        cmd = ["aplay", path]
     else:
-        subprocess.run(["mpg123", path])
\ No newline at end of file
+        cmd = ["mpg123", path]
+    _proc = subprocess.Popen(cmd)
+    _proc.wait()
+
+
+def _play_stream(speech, wait):
+    global _proc, _speech
+    _speech = speech
+    try:
+        if config.PLAYER_BACKEND == "null":
+            speech.close()
+            return
+        if config.PLAYER_BACKEND == "stream":
+            try:
+                get_player().play_stream(speech, wait=wait)
+                if wait:
+                    _record_playback_start()
+                return
+            except Exception as e:
+                if speech.closed:
+                    return
+                print("⚠️ In-process playback failed, falling back to subprocess:", e)
+        if IS_MAC:
+            # afplay can't read a pipe
+            import tempfile
+            from capture import save_wav
+            import numpy as np
+            with tempfile.NamedTemporaryFile(suffix=".wav") as f:
+                save_wav(np.concatenate(list(speech)), speech.samplerate, f.name)
+                _proc = subprocess.Popen(["afplay", f.name])
+                _proc.wait()
+            return
+        cmd = ["aplay", "-q", "-t", "raw", "-f", "S16_LE", "-c", "1", "-r", str(speech.samplerate)]
+        _proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        try:
+            for chunk in speech:
+                _proc.stdin.write(chunk.tobytes())
+            _proc.stdin.close()
+        except BrokenPipeError:
+            speech.close()
+        _proc.wait()
+    finally:
+        if _speech is speech:
+            _speech = None
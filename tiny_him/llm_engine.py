@@ -0,0 +1,165 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+import barge_in
+import config
+import hedge
+import models
+
+_model_path = None
+_system_prompt = None           # the callers' system prompt, primed into the KV cache
+_primed = None                  # the system prompt the loaded model was primed with
+_lock = threading.Lock()        # one generation at a time
+_waiting = 0                    # foreground generations waiting for or holding _lock
+_waiting_lock = threading.Lock()
+
+load_time = None
+last_query_time = None
+
+def _load():
+    global load_time, _primed
+    from llama_cpp import Llama
+    model_path = _model_path or config.LOCAL_LLM_PATH
+    print(f"🧠 Loading local LLM: {model_path}")
+    start = time.perf_counter()
+    llm = Llama(model_path=model_path, n_ctx=config.LOCAL_LLM_N_CTX, verbose=False)
+    load_time = time.perf_counter() - start
+    print(f"⏱️ Local LLM loaded in {load_time:.2f}s")
+    _primed = None
+    system_prompt = _system_prompt or config.SYSTEM_PROMPT
+    if config.LOCAL_LLM_STATE_CACHE and system_prompt:
+        _prime(llm, model_path, system_prompt)
+    return llm
+
+def _state_path(model_path, prompt):
+    # Keyed by the model file, the context size, the llama.cpp build (the state
+    # format isn't stable across versions) and the prompt itself
+    import llama_cpp
+    st = os.stat(model_path)
+    key = hashlib.sha256("\0".join([
+        os.path.realpath(model_path), str(st.st_size), str(int(st.st_mtime)),
+        str(config.LOCAL_LLM_N_CTX), llama_cpp.__version__, prompt
+    ]).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(config.LOCAL_LLM_STATE_DIR, f"{os.path.basename(model_path)}.{key}.state")
+
+def _prime(llm, model_path, prompt):
+    # Puts the prompt prefix into the KV cache, from the snapshot on disk when
+    # there is one. Completions whose prompt starts with the same tokens only
+    # evaluate what comes after them (llama_cpp reuses the longest cached prefix).
+    global _primed
+    _primed = prompt
+    path = _state_path(model_path, prompt)
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            llm.load_state(pickle.load(f))
+        print(f"♻️ Restored system prompt state in {time.perf_counter() - start:.2f}s")
+        return
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print("⚠️ Could not restore system prompt state:", e)
+
+    llm.reset()
+    llm.eval(llm.tokenize(prompt.encode("utf-8")))
+    state = llm.save_state()
+    print(f"⏱️ System prompt evaluated in {time.perf_counter() - start:.2f}s ({state.n_tokens} tokens)")
+    try:
+        os.makedirs(config.LOCAL_LLM_STATE_DIR, exist_ok=True)
+        # Snapshots for an older prompt or model build are dead weight
+        prefix = os.path.basename(model_path) + "."
+        for name in os.listdir(config.LOCAL_LLM_STATE_DIR):
+            stale = name.startswith(prefix) and name.endswith(".state") and len(name) == len(prefix) + 22
+            if stale and name != os.path.basename(path):
+                os.remove(os.path.join(config.LOCAL_LLM_STATE_DIR, name))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print("⚠️ Could not save system prompt state:", e)
+
+def _estimate_mb():
+    # The GGUF is memory-mapped, so its file size is roughly what it will occupy
+    try:
+        return os.path.getsize(_model_path or config.LOCAL_LLM_PATH) / 2**20
+    except OSError:
+        return None
+
+models.register("llm", _load, idle_unload=config.LOCAL_LLM_IDLE_UNLOAD, estimate_mb=_estimate_mb)
+
+def _select(model_path, system_prompt=None):
+    global _model_path, _system_prompt
+    model_path = model_path or config.LOCAL_LLM_PATH
+    if model_path != (_model_path or config.LOCAL_LLM_PATH):
+        models.unload("llm", "switching model")
+    _model_path = model_path
+    if system_prompt:
+        _system_prompt = system_prompt
+
+def get_llm(model_path=None):
+    _select(model_path)
+    return models.get("llm")
+
+def is_loaded():
+    return models.is_loaded("llm")
+
+def preload(model_path=None, system_prompt=None):
+    # system_prompt is what the caller's prompts start with, so loading primes
+    # that prefix rather than config.SYSTEM_PROMPT
+    _select(model_path, system_prompt)
+    models.prefetch(["llm"])
+
+def unload():
+    models.unload("llm")
+
+def _add_waiting(n):
+    global _waiting
+    with _waiting_lock:
+        _waiting += n
+
+def complete(prompt, model_path=None, max_tokens=None, background=False, system_prompt=None):
+    # system_prompt is the prefix prompt starts with (conversation.prompt);
+    # the KV cache is primed with it first when the model was primed with
+    # another. background=True is for work that can be retried later
+    # (conversation summaries): it never makes an interaction wait, stopping
+    # at the next token once one asks, and returns None if it didn't finish.
+    global last_query_time
+    from llama_cpp import StoppingCriteriaList
+    _select(model_path, system_prompt)
+    if background:
+        stop = lambda tokens, logits: _waiting > 0
+    else:
+        # The asking interaction's token: a barge-in stops this generation even
+        # once the next interaction has started with a token of its own
+        token = barge_in.token()
+        stop = lambda tokens, logits: token.is_set() or hedge.cancelled()
+        _add_waiting(1)
+    try:
+        with models.use("llm") as llm, _lock:
+            if background and _waiting:
+                return None
+            if not background and token.is_set():
+                raise InterruptedError("interaction aborted")
+            if system_prompt and config.LOCAL_LLM_STATE_CACHE and system_prompt != _primed:
+                _prime(llm, _model_path, system_prompt)
+            start = time.perf_counter()
+            result = llm(
+                prompt,
+                max_tokens=max_tokens or config.LOCAL_LLM_MAX_TOKENS,
+                stopping_criteria=StoppingCriteriaList([stop])
+            )
+            preempted = background and _waiting > 0
+    finally:
+        if not background:
+            _add_waiting(-1)
+    elapsed = time.perf_counter() - start
+    if background:
+        print(f"⏱️ Local LLM background query {'preempted after' if preempted else 'took'} {elapsed:.2f}s")
+        return None if preempted else result["choices"][0]["text"].strip()
+    last_query_time = elapsed
+    print(f"⏱️ Local LLM query took {last_query_time:.2f}s")
+    return result["choices"][0]["text"].strip()
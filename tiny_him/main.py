@@ -1,12 +1,16 @@
-import gpiozero
-from gpiozero.pins.native import NativeFactory
-gpiozero.Device.pin_factory = NativeFactory()
+import startup_profile
+startup_profile.install()
 
-from platform_utils import detect_pi_model, is_online, detect_microphone, detect_speaker
-from openai import OpenAI
+from platform_utils import detect_pi_model, detect_microphone, detect_speaker
 from gpio_handler import start_led_thread, set_state
 from interaction import run_interaction
+import gpio_handler
+import barge_in
 import config
+import conversation
+import health
+import asyncio
+import concurrent.futures
 import threading
 import time
 import sys
@@ -18,41 +22,131 @@ import atexit
 import RPi.GPIO as GPIO
 
 os.environ["OPENAI_API_KEY"] = open("part1.txt").read().strip() + open("part2.txt").read().strip()
-client = OpenAI()
+import transport
+with startup_profile.step("openai client"):
+    client = transport.build_client()
 
 # Set flags
-pi_model = detect_pi_model()
-online = is_online()
-USE_LOCAL = (pi_model == "Pi 5" and not online)
+with startup_profile.step("detect pi model"):
+    pi_model = detect_pi_model()
+if pi_model == "Pi 5":
+    # Only the Pi 5 can run the local models, so only it gets a fallback route
+    health.local_available.update(dict.fromkeys(health.STAGES, True))
+with startup_profile.step("connectivity check"):
+    health.start_monitor()
+USE_LOCAL = (pi_model == "Pi 5" and not health.online)
 
-whisper_model = None
-if USE_LOCAL:
-    import whisper
-    whisper_model = whisper.load_model(config.MODEL_SIZE)
+if health.online:
+    transport.prewarm_async()
+transport.start_keepalive()
 
-has_mic = detect_microphone()
-has_speaker = detect_speaker()
+# Local models live in the model manager. Load the ones this unit will use in
+# the background; a hedged stage needs its local backend ready before the
+# cloud call stalls.
+if pi_model == "Pi 5":
+    import models
+    import offline_logic  # registers the local STT and LLM
+    models.prefetch([s for s in health.local_stages() if s != "llm" or config.LOCAL_LLM_PRELOAD])
+
+if config.TTS_CACHE_ENABLED and config.TTS_CACHE_WARMUP:
+    import tts_cache
+    if USE_LOCAL:
+        from offline_logic import synthesize_speech_local
+        tts_cache.warm_up(config.TTS_CACHE_WARMUP, lambda text: synthesize_speech_local(text, stream=False))
+    else:
+        from online_logic import synthesize_speech_openai
+        tts_cache.warm_up(config.TTS_CACHE_WARMUP, lambda text: synthesize_speech_openai(client, text))
+
+with startup_profile.step("audio devices"):
+    has_mic = detect_microphone()
+    has_speaker = detect_speaker()
+
+if has_speaker and config.PLAYER_BACKEND == "stream":
+    from io_audio import get_player
+    with startup_profile.step("audio output"):
+        try:
+            get_player()
+        except Exception as e:
+            print("⚠️ Could not open audio output:", e)
 
 interaction_lock = threading.Lock()
 stop_event = threading.Event()
+current_task = None
+
+def start_interaction():
+    stop_event.clear()
+    token = barge_in.begin()
+    if health.online:
+        transport.prewarm_async()
+    if config.MODEL_PREFETCH_ON_PRESS:
+        # Whatever was evicted or unloaded while idle loads during the recording
+        import models
+        models.prefetch(health.local_stages())
+    threading.Thread(target=wrapped_interaction, args=(token,), daemon=True).start()
+
+def interrupt_interaction():
+    # Barge-in: abort requests and playback, then go straight back to listening
+    print("✋ Barge-in")
+    barge_in.abort()
+    if current_task is not None:
+        import pipeline
+        pipeline.cancel(current_task)
+    if not interaction_lock.acquire(timeout=config.BARGE_IN_TIMEOUT):
+        print("⚠️ Interaction did not stop in time, ignoring press")
+        return
+    start_interaction()
+
+def cancel_interaction(reason):
+    print(f"🛑 {reason}: cancelling")
+    barge_in.abort()
+    stop_event.set()
+    if current_task is not None:
+        import pipeline
+        pipeline.cancel(current_task)
 
 def button_handler():
-    from gpio_handler import button
     while True:
-        button.wait_for_press()
-        if not interaction_lock.acquire(blocking=False):
-            continue
-        stop_event.clear()
-        threading.Thread(target=wrapped_interaction, daemon=True).start()
-        time.sleep(0.3)
-
-def wrapped_interaction():
+        event = gpio_handler.button_events.get()
+        if event.kind == "long_press":
+            if interaction_lock.locked():
+                cancel_interaction("Long press")
+        elif event.kind == "double_press":
+            # New conversation: drop whatever the first press started, and the history
+            if interaction_lock.locked():
+                cancel_interaction("Double press")
+            conversation.reset()
+            print("🆕 New conversation")
+        elif interaction_lock.acquire(blocking=False):
+            start_interaction()
+        elif gpio_handler.state == "listening":
+            stop_event.set()
+        elif config.BARGE_IN and gpio_handler.state in ("processing", "speaking"):
+            interrupt_interaction()
+
+def wrapped_interaction(token):
+    global current_task
     try:
-        run_interaction(client, config, stop_event, whisper_model, online=not USE_LOCAL)
+        if config.PIPELINE_ASYNC:
+            import pipeline
+            current_task = pipeline.submit(
+                pipeline.run_pipeline(client, config, stop_event, token=token)
+            )
+            pipeline.wait(current_task)
+        else:
+            run_interaction(client, config, stop_event, token=token)
+    except (asyncio.CancelledError, concurrent.futures.CancelledError):
+        print("✋ Interaction cancelled")
+    except Exception as e:
+        if token.is_set():
+            print("✋ Interaction cancelled")
+        else:
+            print("⚠️ Interaction failed:", e)
     finally:
+        current_task = None
         interaction_lock.release()
 
 set_state("ready")
+startup_profile.report()
 start_led_thread()
 threading.Thread(target=button_handler, daemon=True).start()
 
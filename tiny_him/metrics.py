@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import config
+
+# Per-stage wall times for every interaction. Each (stage, backend) pair keeps
+# a rolling window for p50/p95/p99 plus cumulative count/sum. After each
+# interaction the numbers are written to a node-exporter textfile and the
+# interaction itself is appended to a JSONL log.
+
+STAGES = ("press_to_callback", "press_to_record", "capture", "encode", "upload", "stt_segment",
+          "stt", "llm_ttft", "llm_total", "tts", "first_audio", "playback_start", "led")
+QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+_windows = {}          # (stage, backend) -> deque of seconds
+_totals = {}           # (stage, backend) -> [count, sum]
+_current = None
+_backend = "online"
+_marks = {}            # name -> (perf_counter, backend), for spans that start outside a stage
+_counters = {}         # (name, sorted label items) -> count
+_detached = set()      # thread idents whose samples stay out of the current interaction
+_warned = set()
+
+def reset():
+    global _current
+    with _lock:
+        _windows.clear()
+        _totals.clear()
+        _counters.clear()
+        _current = None
+
+def start_interaction(backend):
+    global _current, _backend
+    _backend = backend
+    with _lock:
+        _current = {"ts": time.time(), "backend": backend, "stages": {}}
+
+def record(stage, seconds, backend=None):
+    if not config.METRICS_ENABLED or seconds is None:
+        return
+    key = (stage, backend or _backend)
+    with _lock:
+        if key not in _windows:
+            _windows[key] = deque(maxlen=config.METRICS_WINDOW)
+            _totals[key] = [0, 0.0]
+        _windows[key].append(seconds)
+        _totals[key][0] += 1
+        _totals[key][1] += seconds
+        if _current is not None and threading.get_ident() not in _detached:
+            # One value per call, like the windows: tts and stt_segment run
+            # once per sentence / segment and list each call
+            _current["stages"].setdefault(stage, []).append(seconds)
+
+def detach(thread_ident):
+    # The thread's samples still feed the rolling windows but no longer count
+    # towards the current interaction (e.g. the losing side of a hedged request)
+    _detached.add(thread_ident)
+
+def attach(thread_ident):
+    _detached.discard(thread_ident)
+
+def increment(name, amount=1, **labels):
+    if not config.METRICS_ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def note(key, **values):
+    # Extra fields for the current interaction's JSONL entry
+    with _lock:
+        if _current is not None:
+            _current.setdefault(key, {}).update(values)
+
+def counters(name):
+    with _lock:
+        return {labels: count for (n, labels), count in _counters.items() if n == name}
+
+def mark(name, at=None, backend=None):
+    _marks[name] = (time.perf_counter() if at is None else at, backend)
+
+def record_since(stage, mark_name):
+    # One-shot: records the time since mark() and forgets the mark
+    entry = _marks.pop(mark_name, None)
+    if entry is not None:
+        record(stage, time.perf_counter() - entry[0], entry[1])
+
+@contextmanager
+def timer(stage, backend=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start, backend)
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+def samples(stage, backend):
+    with _lock:
+        return list(_windows.get((stage, backend), ()))
+
+def snapshot():
+    with _lock:
+        return {
+            key: {
+                "count": _totals[key][0],
+                "sum": _totals[key][1],
+                "quantiles": {q: percentile(window, q) for q in QUANTILES},
+            }
+            for key, window in _windows.items()
+        }
+
+def _warn_once(path, e):
+    if path not in _warned:
+        _warned.add(path)
+        print(f"⚠️ Could not write metrics to {path}: {e}")
+
+def write_textfile(path):
+    lines = [
+        "# HELP pim_stage_seconds Wall time per interaction stage (rolling window quantiles).",
+        "# TYPE pim_stage_seconds summary",
+    ]
+    for (stage, backend), stats in sorted(snapshot().items()):
+        labels = f'stage="{stage}",backend="{backend}"'
+        for q, value in stats["quantiles"].items():
+            lines.append(f'pim_stage_seconds{{{labels},quantile="{q}"}} {value:.6f}')
+        lines.append(f"pim_stage_seconds_sum{{{labels}}} {stats['sum']:.6f}")
+        lines.append(f"pim_stage_seconds_count{{{labels}}} {stats['count']}")
+    with _lock:
+        counts = sorted(_counters.items())
+    for name in sorted({name for (name, _), _ in counts}):
+        lines.append(f"# TYPE pim_{name}_total counter")
+        for (n, labels), count in counts:
+            if n == name:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"pim_{name}_total{{{label_text}}} {count}")
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+    except OSError as e:
+        _warn_once(path, e)
+
+def finish_interaction(**extra):
+    global _current
+    if not config.METRICS_ENABLED:
+        return
+    with _lock:
+        entry, _current = _current, None
+    if entry is None:
+        return
+    entry.update(extra)
+    summary = ", ".join(f"{k}={'+'.join(f'{v:.2f}' for v in values)}s" for k, values in entry["stages"].items())
+    print(f"📊 {summary}")
+    if config.METRICS_JSONL:
+        try:
+            with open(config.METRICS_JSONL, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            _warn_once(config.METRICS_JSONL, e)
+    if config.METRICS_TEXTFILE:
+        write_textfile(config.METRICS_TEXTFILE)
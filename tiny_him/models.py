@@ -0,0 +1,198 @@
+import gc
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+# Resident local models (Whisper, the LLM and, with LOCAL_TTS_ENGINE="piper",
+# the offline voice) under one memory budget. Each model is registered with a loader; get() loads it on demand,
+# measuring how much the process RSS grew. Before a load, least recently used
+# idle models are unloaded until the new one fits both MODEL_MEMORY_BUDGET_MB
+# and the MemAvailable floor, so the Pi never has to swap. A reaper thread
+# frees models that sat unused for their idle timeout, and prefetch() lets a
+# button press start loading whatever the next interaction will need.
+
+REAP_INTERVAL = 5.0
+
+class _Entry:
+    def __init__(self, name, loader, idle_unload, estimate_mb):
+        self.name = name
+        self.loader = loader
+        self.idle_unload = idle_unload
+        self.estimate_mb = estimate_mb
+        self.model = None
+        self.rss_mb = None          # measured RSS growth of the last load
+        self.last_used = 0.0
+        self.busy = 0
+        self.load_lock = threading.Lock()
+
+    @property
+    def footprint_mb(self):
+        # Memory-mapped weights keep growing after the load as pages are touched
+        estimate = self.estimate_mb() if callable(self.estimate_mb) else self.estimate_mb
+        return max(self.rss_mb or 0.0, estimate or 0.0)
+
+_lock = threading.Lock()
+_load_lock = threading.Lock()   # one load at a time, so RSS deltas are per model
+_entries = {}
+_reaper = None
+
+def process_memory():
+    # (current, peak) resident set size of this process in MB
+    try:
+        with open("/proc/self/status") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(status["VmRSS"].split()[0]) / 1024, int(status["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        import resource
+        return None, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def meminfo():
+    # /proc/meminfo in MB, empty where it doesn't exist (macOS)
+    try:
+        with open("/proc/meminfo") as f:
+            return {
+                key: int(value.split()[0]) / 1024
+                for key, value in (line.split(":", 1) for line in f if ":" in line)
+            }
+    except (OSError, ValueError):
+        return {}
+
+def register(name, loader, idle_unload=None, estimate_mb=None):
+    # estimate_mb: MB (or a callable returning MB) to plan the first load with
+    with _lock:
+        if name not in _entries:
+            _entries[name] = _Entry(
+                name, loader,
+                config.MODEL_IDLE_UNLOAD if idle_unload is None else idle_unload,
+                estimate_mb
+            )
+    _start_reaper()
+
+def is_loaded(name):
+    entry = _entries.get(name)
+    return entry is not None and entry.model is not None
+
+def resident():
+    # name -> MB for every loaded model
+    with _lock:
+        return {e.name: e.footprint_mb for e in _entries.values() if e.model is not None}
+
+def _make_room(needed_mb, exclude):
+    while True:
+        with _lock:
+            used = sum(e.footprint_mb for e in _entries.values() if e.model is not None)
+            candidates = [
+                e for e in _entries.values()
+                if e.model is not None and not e.busy and e.name != exclude
+            ]
+        available = meminfo().get("MemAvailable")
+        over_budget = used + needed_mb > config.MODEL_MEMORY_BUDGET_MB
+        low_memory = available is not None and available - needed_mb < config.MODEL_MIN_AVAILABLE_MB
+        if not (over_budget or low_memory):
+            return
+        if not candidates:
+            print(f"⚠️ No idle model to unload for {exclude} ({needed_mb:.0f} MB needed, "
+                  f"{used:.0f} MB resident, {available or 0:.0f} MB available)")
+            return
+        victim = min(candidates, key=lambda e: e.last_used)
+        _unload(victim, "memory budget")
+
+def _load(entry):
+    with _load_lock:
+        _make_room(entry.footprint_mb, entry.name)
+        gc.collect()
+        before, _ = process_memory()
+        start = time.perf_counter()
+        model = entry.loader()
+        after, _ = process_memory()
+        if before is not None and after is not None:
+            entry.rss_mb = max(0.0, after - before)
+        entry.model = model
+    rss = f", +{entry.rss_mb:.0f} MB" if entry.rss_mb is not None else ""
+    print(f"📦 Loaded {entry.name} in {time.perf_counter() - start:.2f}s{rss}")
+
+def _acquire(name, busy):
+    entry = _entries[name]
+    while True:
+        with entry.load_lock:
+            if entry.model is None:
+                _load(entry)
+            with _lock:
+                # Retry if another load evicted it before we could mark it used
+                if entry.model is not None:
+                    entry.last_used = time.monotonic()
+                    entry.busy += busy
+                    return entry.model
+
+def get(name):
+    # Loads the model but doesn't pin it: once idle it can be unloaded again,
+    # so only use the result right away. Anything kept across calls goes
+    # through use() each time instead.
+    return _acquire(name, 0)
+
+@contextmanager
+def use(name):
+    # Like get(), but the model can't be evicted until the block exits
+    model = _acquire(name, 1)
+    entry = _entries[name]
+    try:
+        yield model
+    finally:
+        with _lock:
+            entry.busy -= 1
+            entry.last_used = time.monotonic()
+
+def _unload(entry, reason):
+    with _lock:
+        if entry.model is None or entry.busy:
+            return False
+        model, entry.model = entry.model, None
+    close = getattr(model, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            pass
+    del model
+    gc.collect()
+    print(f"💤 Unloaded {entry.name} ({reason}, ~{entry.footprint_mb:.0f} MB)")
+    return True
+
+def unload(name, reason="requested"):
+    entry = _entries.get(name)
+    return entry is not None and _unload(entry, reason)
+
+def prefetch(names):
+    # Loads models in the background (e.g. on a button press, while the user
+    # is still talking) so the first local call doesn't pay a cold load
+    def worker(name):
+        try:
+            get(name)
+        except Exception as e:
+            print(f"⚠️ Preloading {name} failed:", e)
+
+    for name in names:
+        if name in _entries and not is_loaded(name):
+            threading.Thread(target=worker, args=(name,), daemon=True).start()
+
+def _reap_loop():
+    while True:
+        time.sleep(REAP_INTERVAL)
+        now = time.monotonic()
+        with _lock:
+            idle = [
+                e for e in _entries.values()
+                if e.model is not None and not e.busy and e.idle_unload
+                and now - e.last_used >= e.idle_unload
+            ]
+        for entry in idle:
+            _unload(entry, f"idle {entry.idle_unload:.0f}s")
+
+def _start_reaper():
+    global _reaper
+    with _lock:
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reap_loop, daemon=True)
+            _reaper.start()
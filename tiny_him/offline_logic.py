@@ -1,15 +1,68 @@
-from llama_cpp import Llama
-import whisper
-import subprocess
+from contextlib import nullcontext
+import llm_engine
+import config
+import conversation
+import tts_cache
+import tts_engines
+import metrics
+import models
+from capture import save_wav
 
-def transcribe_audio_local(model, audio_path):
-    return model.transcribe(audio_path, language="en")["text"]
+def _load_stt():
+    import stt_backends
+    return stt_backends.load()
+
+def _estimate_stt_mb():
+    import stt_backends
+    return stt_backends.estimate_mb()
+
+models.register("stt", _load_stt, estimate_mb=_estimate_stt_mb)
+tts_engines.get_engine()  # registers a neural voice with the model manager
+
+def use_whisper(model=None):
+    # Context manager giving the STT backend for one decode: an explicit model
+    # as is, or the configured backend (stt_backends) pinned by the model
+    # manager until the block exits. Live transcribers call it per pass
+    # rather than holding the model, so it can be unloaded between them.
+    return nullcontext(model) if model is not None else models.use("stt")
+
+def transcribe_audio_local(model, audio, samplerate=16000, stage="stt"):
+    if not isinstance(audio, str):
+        from capture import to_mono_float32
+        audio = to_mono_float32(audio, samplerate)
+    with use_whisper(model) as model, metrics.timer(stage, "local"):
+        return model.transcribe(audio)["text"]
 
 def query_local_llm(prompt, model_path, system_prompt):
-    llm = Llama(model_path=model_path, n_ctx=1024)
-    result = llm(system_prompt + prompt, max_tokens=200)
-    return result["choices"][0]["text"].strip()
+    with metrics.timer("llm_total", "local"):
+        reply = llm_engine.complete(conversation.prompt(system_prompt, prompt), model_path=model_path, system_prompt=system_prompt)
+    # Not streamed, so the first token arrives with the whole reply
+    metrics.record("llm_ttft", llm_engine.last_query_time, "local")
+    return reply
+
+def synthesize_speech_local(text, output_path=None, stream=None):
+    # A tts_engines.SpeechStream that plays while the engine renders it, or a
+    # WAV path for cached clips and output_path. With LOCAL_TTS_STREAM and the
+    # cache both off, the clip is rendered whole into memory, not to a file.
+    # Streamed, the "tts" stage is the time to the first chunk of audio.
+    engine = tts_engines.get_engine()
+    voice = tts_engines.voice_id()
+    render = lambda path: tts_engines.render(text, path)
+    stream = config.LOCAL_TTS_STREAM if stream is None else stream
 
-def synthesize_speech_local(text, output_path="response.wav"):
-    subprocess.run(["espeak", text, "-w", output_path])
-    return output_path
\ No newline at end of file
+    with metrics.timer("tts", "local"):
+        if output_path:
+            return render(output_path)
+        if not config.TTS_CACHE_ENABLED:
+            return engine.speak(text) if stream else tts_engines.buffered(text)
+        if not stream:
+            return tts_cache.get_or_create(text, engine.name, voice, None, ".wav", render)
+        cached = tts_cache.lookup(text, engine.name, voice, None)
+        if cached:
+            return cached
+        speech = engine.speak(text)
+    # Fully played clips are kept, so the next time this sentence comes from the cache
+    speech.on_complete = lambda pcm: tts_cache.store(
+        text, engine.name, voice, None, ".wav", lambda path: save_wav(pcm, speech.samplerate, path)
+    )
+    return speech
@@ -1,30 +1,78 @@
-from openai import OpenAI
+import time
 import uuid
+import config
+import tts_cache
+import barge_in
+import conversation
+import metrics
+import transport
 
-def transcribe_audio(client, audio_path):
-    with open(audio_path, "rb") as audio_file:
-        transcript = client.audio.transcriptions.create(
+def transcribe_audio(client, audio, samplerate=16000, stage="stt"):
+    # audio is a WAV path or int16 PCM straight from the capture ring buffer
+    from upload_audio import prepare
+    filename, data, _ = prepare(audio, samplerate)
+
+    timing = {}
+    with metrics.timer(stage, "online"):
+        transcript = transport.run(client, lambda c: c.audio.transcriptions.create(
             model="whisper-1",
-            file=audio_file,
+            file=(filename, data),
             language="en"
-        )
+        ), timing)
+    if "headers" in timing:
+        # From the request going out to the response headers: the upload plus
+        # the server's turnaround, without connection setup or reading the body
+        metrics.record("upload", timing["headers"] - timing["sent"], "online")
     return transcript.text
 
 def query_chatgpt(client, user_input, model, system_prompt):
-    response = client.chat.completions.create(
+    start = time.perf_counter()
+    response = transport.run(client, lambda c: c.chat.completions.create(
         model=model,
-        messages=[{"role": "user", "content": system_prompt + user_input}]
-    )
+        messages=conversation.messages(system_prompt, user_input)
+    ))
+    elapsed = time.perf_counter() - start
+    metrics.record("llm_ttft", elapsed, "online")
+    metrics.record("llm_total", elapsed, "online")
     return response.choices[0].message.content.strip()
 
-def synthesize_speech_openai(client, text, output_path=None):
-    if not output_path:
-        output_path = f"response_{uuid.uuid4().hex}.mp3"
-    response = client.audio.speech.create(
-        model="tts-1",
-        voice="nova",
-        input=text
+def stream_chatgpt(client, user_input, model, system_prompt):
+    start = time.perf_counter()
+    first = True
+    stream = client.chat.completions.create(
+        model=model,
+        messages=conversation.messages(system_prompt, user_input),
+        stream=True
     )
-    with open(output_path, "wb") as f:
-        f.write(response.content)
-    return output_path
\ No newline at end of file
+    barge_in.register(stream)
+    try:
+        for chunk in stream:
+            if barge_in.cancelled():
+                break
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first:
+                    first = False
+                    metrics.record("llm_ttft", time.perf_counter() - start, "online")
+                yield chunk.choices[0].delta.content
+    finally:
+        barge_in.unregister(stream)
+        stream.close()
+        metrics.record("llm_total", time.perf_counter() - start, "online")
+
+def synthesize_speech_openai(client, text, output_path=None, model="tts-1", voice="nova"):
+    def render(path):
+        response = transport.run(client, lambda c: c.audio.speech.create(
+            model=model,
+            voice=voice,
+            input=text
+        ))
+        with open(path, "wb") as f:
+            f.write(response.content)
+        return path
+
+    with metrics.timer("tts", "online"):
+        if not output_path and config.TTS_CACHE_ENABLED:
+            return tts_cache.get_or_create(text, "openai", voice, model, ".mp3", render)
+        if not output_path:
+            output_path = f"response_{uuid.uuid4().hex}.mp3"
+        return render(output_path)
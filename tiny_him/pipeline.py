@@ -0,0 +1,177 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import barge_in
+import conversation
+import health
+import metrics
+import stages
+from gpio_handler import set_state
+from io_audio import capture_audio, get_player, play_audio, wait_for_playback
+from streaming import sentence_chunks
+
+# asyncio version of run_interaction: record -> STT -> LLM -> TTS -> playback
+# as async stages joined by bounded queues. Blocking backends (Whisper,
+# llama_cpp, espeak, the OpenAI SDK) run in the default executor, and side
+# work such as opening the output device or warming the LLM runs while the
+# user is still talking.
+
+_loop = None
+
+def get_loop():
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        threading.Thread(target=_loop.run_forever, daemon=True).start()
+    return _loop
+
+def submit(coro):
+    # Schedules the pipeline and returns its asyncio.Task. Use wait() and
+    # cancel() from other threads; unlike a run_coroutine_threadsafe future,
+    # wait() only returns once the pipeline's own cleanup has run.
+    loop = get_loop()
+    created = concurrent.futures.Future()
+    loop.call_soon_threadsafe(lambda: created.set_result(loop.create_task(coro)))
+    return created.result()
+
+def wait(task):
+    done = threading.Event()
+    get_loop().call_soon_threadsafe(task.add_done_callback, lambda t: done.set())
+    done.wait()
+    return task.result()
+
+def cancel(task):
+    get_loop().call_soon_threadsafe(task.cancel)
+
+async def _feed_from_thread(make_iter, out_q):
+    # Drain a blocking iterator on a worker thread into an asyncio queue,
+    # respecting the queue bound. The worker gives up if the stage is cancelled.
+    loop = asyncio.get_running_loop()
+    stop = threading.Event()
+
+    def worker():
+        for item in make_iter():
+            fut = asyncio.run_coroutine_threadsafe(out_q.put(item), loop)
+            while True:
+                try:
+                    fut.result(timeout=0.2)
+                    break
+                except concurrent.futures.TimeoutError:
+                    if stop.is_set():
+                        fut.cancel()
+                        return
+            if stop.is_set():
+                return
+
+    try:
+        await asyncio.to_thread(worker)
+    finally:
+        # Cancelled or failed: the worker must not block on the queue, and
+        # there is no end marker since the consumer is being cancelled too
+        stop.set()
+    await out_q.put(None)
+
+async def _run_stages(*coros):
+    # gather() alone leaves the other stages running when one fails, blocked
+    # on a queue nobody drains any more (and holding their worker threads).
+    # All of them are cancelled on the way out, failure or not.
+    tasks = [asyncio.create_task(coro) for coro in coros]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def _warm_up(config, routes):
+    tasks = []
+    if config.PLAYER_BACKEND == "stream":
+        tasks.append(asyncio.to_thread(get_player))
+    if any(routes.values()):
+        import transport
+        tasks.append(asyncio.to_thread(transport.prewarm))
+    if not routes["llm"]:
+        import llm_engine
+        tasks.append(asyncio.to_thread(llm_engine.get_llm, config.LOCAL_LLM_PATH))
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, Exception):
+            print("⚠️ Warm-up failed:", result)
+
+async def _llm_stage(client, config, user_text, routes, sentences, reply_parts):
+    context, cached = await asyncio.to_thread(stages.cached_reply, user_text)
+    served = {}
+    if cached:
+        deltas = lambda: iter([cached])
+    else:
+        deltas = lambda: stages.reply_deltas(client, config, user_text, routes, served)
+
+    def chunks():
+        for sentence in sentence_chunks(deltas(), config.STREAM_MIN_SENTENCE_CHARS):
+            reply_parts.append(sentence)
+            yield sentence
+
+    await _feed_from_thread(chunks, sentences)
+    if barge_in.cancelled():
+        return
+    await asyncio.to_thread(stages.remember, user_text, " ".join(reply_parts), served, context, cached)
+
+async def _tts_stage(client, sentences, clips, routes):
+    while (sentence := await sentences.get()) is not None:
+        path = await asyncio.to_thread(stages.synthesize, client, sentence, routes)
+        if path:
+            await clips.put(path)
+    await clips.put(None)
+
+async def _play_stage(clips, warm_up, captured_at):
+    first = True
+    while (path := await clips.get()) is not None:
+        if first:
+            first = False
+            await warm_up
+            metrics.record("first_audio", time.perf_counter() - captured_at)
+            set_state("speaking")
+        await asyncio.to_thread(play_audio, path, False)
+    await asyncio.to_thread(wait_for_playback)
+
+async def run_pipeline(client, config, stop_event, whisper_model=None, online=None, token=None):
+    # online=None routes each stage through the health monitor; True/False forces all stages.
+    # token is the interaction's barge-in token; a fresh one when not given. The
+    # task's context carries it into every stage thread (to_thread copies it).
+    barge_in.bind(token or barge_in.begin())
+    routes = health.plan() if online is None else dict.fromkeys(health.STAGES, online)
+    set_state("listening")
+    barge_in.report_listening()
+    metrics.start_interaction(health.backend_label(routes))
+    warm_up = asyncio.create_task(_warm_up(config, routes))
+    try:
+        from stream_stt import live_transcriber
+        transcriber = await asyncio.to_thread(live_transcriber, client, config, routes["stt"], whisper_model)
+        audio = await asyncio.to_thread(
+            capture_audio, config, stop_event, transcriber.start if transcriber else None
+        )
+        if audio is None or barge_in.cancelled():
+            if transcriber:
+                transcriber.cancel()
+            return
+
+        set_state("processing")
+        captured_at = time.perf_counter()
+        user_text = await asyncio.to_thread(
+            stages.transcribe, client, config, audio, routes, whisper_model, transcriber
+        )
+
+        sentences = asyncio.Queue(maxsize=config.PIPELINE_QUEUE_SIZE)
+        clips = asyncio.Queue(maxsize=config.PIPELINE_QUEUE_SIZE)
+        reply_parts = []
+        await _run_stages(
+            _llm_stage(client, config, user_text, routes, sentences, reply_parts),
+            _tts_stage(client, sentences, clips, routes),
+            _play_stage(clips, warm_up, captured_at)
+        )
+        conversation.compact_async(client, routes["llm"])
+    finally:
+        if not warm_up.done():
+            warm_up.cancel()
+        metrics.finish_interaction(cancelled=barge_in.cancelled())
+        set_state("ready")
@@ -0,0 +1,170 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+class AudioPlayer:
+    # One long-lived sounddevice output stream. Decoded clips are queued as
+    # float32 buffers and the callback moves straight from one buffer to the
+    # next, so consecutive clips play back without gaps or process spawns.
+    #
+    # Only the callback touches the clip it is playing. flush() (a barge-in,
+    # on another thread) bumps the generation instead; the callback drops its
+    # clip when it sees the change, and clips queued under an older
+    # generation, e.g. by a decode that finished after the flush, are skipped.
+
+    def __init__(self, samplerate=24000, device=None, blocksize=1024):
+        self.samplerate = samplerate
+        self.device = device
+        self.blocksize = blocksize
+        self.last_start_latency = None
+        self._queue = queue.Queue()
+        self._current = None
+        self._pos = 0
+        self._generation = 0
+        self._playing = 0           # generation the callback last played under
+        self._idle = threading.Event()
+        self._idle.set()
+        self._stream = None
+
+    def start(self):
+        if self._stream is not None:
+            return
+        import sounddevice as sd
+        self._stream = sd.OutputStream(
+            samplerate=self.samplerate,
+            channels=1,
+            dtype="float32",
+            device=self.device,
+            blocksize=self.blocksize,
+            callback=self._callback
+        )
+        self._stream.start()
+        print(f"🔈 Audio output open at {self.samplerate} Hz")
+
+    def stop(self):
+        self.flush()
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def _callback(self, outdata, frames, time_info, status):
+        out = outdata[:, 0]
+        filled = 0
+        generation = self._generation
+        current = self._current
+        if self._playing != generation:
+            current = None
+            self._playing = generation
+        while filled < frames:
+            if current is None:
+                try:
+                    current, requested_at, queued_under = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if queued_under != generation:
+                    current = None
+                    continue
+                self._pos = 0
+                if requested_at is not None:
+                    self.last_start_latency = time.perf_counter() - requested_at + self._stream.latency
+            n = min(frames - filled, len(current) - self._pos)
+            out[filled:filled + n] = current[self._pos:self._pos + n]
+            filled += n
+            self._pos += n
+            if self._pos >= len(current):
+                current = None
+        out[filled:] = 0
+        self._current = current
+        if current is None and self._queue.empty():
+            self._idle.set()
+
+    def generation(self):
+        # Taken before decoding or rendering; enqueue() drops what a flush made stale
+        return self._generation
+
+    def enqueue(self, samples, generation=None):
+        generation = self._generation if generation is None else generation
+        if generation != self._generation:
+            return False
+        # Only time the start of playback when nothing else is queued ahead of it
+        requested_at = time.perf_counter() if self._idle.is_set() else None
+        # Queued before clearing idle: cleared first, the callback could find
+        # the queue still empty and set idle again with the clip pending. This
+        # way round a stray clear is undone by the next callback.
+        self._queue.put((samples, requested_at, generation))
+        self._idle.clear()
+        return True
+
+    def play_file(self, path, wait=True):
+        generation = self.generation()
+        self.enqueue(decode_file(path, self.samplerate), generation)
+        if wait:
+            self.wait()
+
+    def play_stream(self, stream, wait=True):
+        # Chunks are queued as the engine renders them; the callback runs from
+        # one to the next like consecutive clips
+        generation = self.generation()
+        resample = StreamResampler(stream.samplerate, self.samplerate)
+        for chunk in stream:
+            if not self.enqueue(resample(chunk), generation):
+                stream.close()
+                break
+        else:
+            tail = resample(None)
+            if len(tail):
+                self.enqueue(tail, generation)
+        if wait:
+            self.wait()
+
+    def flush(self):
+        # The callback drops the clip it is playing on its next block
+        self._generation += 1
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._idle.set()
+
+    def wait(self, timeout=None):
+        done = self._idle.wait(timeout)
+        if done and self.last_start_latency is not None:
+            print(f"⏱️ Playback started {self.last_start_latency * 1000:.0f} ms after request")
+        return done
+
+def decode_file(path, samplerate):
+    # WAV and (with libsndfile >= 1.1) MP3 are decoded in-process by soundfile
+    import soundfile as sf
+    from capture import to_mono_float32
+    pcm, rate = sf.read(path, dtype="int16", always_2d=True)
+    return to_mono_float32(pcm, rate, target_rate=samplerate)
+
+class StreamResampler:
+    # int16 chunks in, float32 at the player rate out. soxr keeps its filter
+    # state across chunks; the np.interp fallback resamples each on its own.
+    # Call with None at the end to get what soxr still holds back.
+
+    def __init__(self, samplerate, target_rate):
+        self.samplerate = samplerate
+        self.target_rate = target_rate
+        self._soxr = None
+        if samplerate != target_rate:
+            try:
+                import soxr
+                self._soxr = soxr.ResampleStream(samplerate, target_rate, 1, dtype="float32")
+            except ImportError:
+                pass
+
+    def __call__(self, chunk):
+        from capture import to_mono_float32
+        if chunk is None:
+            if self._soxr is None:
+                return np.zeros(0, dtype=np.float32)
+            return self._soxr.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+        if self._soxr is None:
+            return to_mono_float32(chunk, self.samplerate, target_rate=self.target_rate)
+        return self._soxr.resample_chunk(to_mono_float32(chunk, self.samplerate, self.samplerate), last=False)
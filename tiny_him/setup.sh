@@ -2,7 +2,7 @@
 
 echo "🔧 Installing system packages..."
 sudo apt update
-sudo apt install -y mpg123 espeak alsa-utils python3-pip
+sudo apt install -y mpg123 espeak-ng alsa-utils python3-pip
 
 echo "🐍 Installing Python dependencies..."
 pip3 install -r requirements.txt
@@ -0,0 +1,72 @@
+import answer_cache
+import conversation
+import health
+
+# The backends behind each stage of an interaction, shared by the sequential
+# engine (interaction.py) and the asyncio pipeline (pipeline.py). routes comes
+# from health.plan(); health.call/stream run the planned side and fall back
+# to the other. Everything here blocks, so the pipeline runs it in threads.
+
+def transcribe(client, config, audio, routes, whisper_model=None, transcriber=None):
+    from online_logic import transcribe_audio
+    from offline_logic import transcribe_audio_local
+    # The live transcriber only covers the route it was built for; the other
+    # side (fallback or hedge) transcribes the whole recording
+    online = lambda: transcribe_audio(client, audio, config.CAPTURE_SAMPLERATE)
+    local = lambda: transcribe_audio_local(whisper_model, audio, config.CAPTURE_SAMPLERATE)
+    if transcriber:
+        if routes["stt"]:
+            online = transcriber.finish
+        else:
+            local = transcriber.finish
+    return health.call("stt", online, local, routes["stt"])
+
+def cached_reply(user_text):
+    # (context, answer or None). context is the history digest the question
+    # is asked against; answers are cached under it (see answer_cache.lookup).
+    context = conversation.digest()
+    return context, answer_cache.lookup(user_text, context)
+
+def _local_reply(config, user_text):
+    from offline_logic import query_local_llm
+    return query_local_llm(user_text, config.LOCAL_LLM_PATH, config.SYSTEM_PROMPT)
+
+def reply_deltas(client, config, user_text, routes, served):
+    # Text deltas of the reply; a local reply arrives whole. served["llm"]
+    # tells which backend gave it (see health.call).
+    from online_logic import stream_chatgpt
+    return health.stream(
+        "llm",
+        lambda: stream_chatgpt(client, user_text, config.OPENAI_MODEL, config.SYSTEM_PROMPT),
+        lambda: iter([_local_reply(config, user_text)]),
+        routes["llm"],
+        served
+    )
+
+def reply(client, config, user_text, routes, served):
+    from online_logic import query_chatgpt
+    return health.call(
+        "llm",
+        lambda: query_chatgpt(client, user_text, config.OPENAI_MODEL, config.SYSTEM_PROMPT),
+        lambda: _local_reply(config, user_text),
+        routes["llm"],
+        served
+    )
+
+def synthesize(client, text, routes):
+    from online_logic import synthesize_speech_openai
+    from offline_logic import synthesize_speech_local
+    return health.call(
+        "tts",
+        lambda: synthesize_speech_openai(client, text),
+        lambda: synthesize_speech_local(text),
+        routes["tts"]
+    )
+
+def remember(user_text, reply_text, served, context, cached):
+    # Once a reply has been given in full: the turn goes into the history, and
+    # a GPT answer into the answer cache under the history it was given in. A
+    # local answer after a fallback never is, even though the route planned GPT.
+    conversation.add_turn(user_text, reply_text)
+    if served.get("llm") == "online" and not cached:
+        answer_cache.store(user_text, reply_text, context)
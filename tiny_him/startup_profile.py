@@ -0,0 +1,58 @@
+import builtins
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# `python3 main.py --profile-startup` (or pim.py, pim_io.py, pim_zero.py,
+# pim_zero_button.py) times every top-level import and init step between
+# process start and ready, then prints a breakdown.
+
+ENABLED = "--profile-startup" in sys.argv
+
+_start = time.perf_counter()
+_real_import = builtins.__import__
+_depth = 0
+_imports = []
+_steps = []
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Only the outermost import of a module not loaded yet, on the main thread,
+    # so each entry includes everything that module pulled in
+    global _depth
+    if level or _depth or name in sys.modules or threading.current_thread() is not threading.main_thread():
+        return _real_import(name, globals, locals, fromlist, level)
+    _depth += 1
+    start = time.perf_counter()
+    try:
+        return _real_import(name, globals, locals, fromlist, level)
+    finally:
+        _depth -= 1
+        _imports.append((name, time.perf_counter() - start))
+
+def install():
+    if ENABLED:
+        builtins.__import__ = _timed_import
+
+@contextmanager
+def step(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _steps.append((name, time.perf_counter() - start))
+
+def report(min_ms=5):
+    if not ENABLED:
+        return
+    builtins.__import__ = _real_import
+    print("\n⏱️ Startup profile")
+    print("  imports:")
+    for name, seconds in sorted(_imports, key=lambda x: -x[1]):
+        if seconds * 1000 >= min_ms:
+            print(f"    {seconds * 1000:8.1f} ms  {name}")
+    print("  init steps:")
+    for name, seconds in _steps:
+        print(f"    {seconds * 1000:8.1f} ms  {name}")
+    total_imports = sum(s for _, s in _imports)
+    print(f"  imports total {total_imports * 1000:.0f} ms, ready after {(time.perf_counter() - _start) * 1000:.0f} ms\n")
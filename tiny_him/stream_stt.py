@@ -0,0 +1,233 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from capture import to_mono_float32
+
+class IncrementalTranscriber:
+    # Runs local Whisper over the live capture while the user is still talking.
+    # Each pass decodes the audio after the last committed point. Segments that
+    # come out the same in two consecutive passes (and aren't the last, still
+    # growing, segment) are committed and the cursor moves past them, so when
+    # recording stops only the unfinished tail needs decoding.
+
+    def __init__(self, model, capture, window_s=15.0, step_s=1.0, min_audio_s=1.0):
+        self.model = model          # None: the model manager's, pinned per pass
+        self.capture = capture
+        self.window_frames = int(window_s * capture.samplerate)
+        self.step_s = step_s
+        self.min_frames = int(min_audio_s * capture.samplerate)
+        self.committed = []
+        self.cursor = 0
+        self.passes = 0
+        self._previous = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.cursor = self.capture.start_frame
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _decode(self, start, end):
+        audio = to_mono_float32(self.capture.read(start, end), self.capture.samplerate)
+        prompt = " ".join(self.committed)[-200:] or None
+        from offline_logic import use_whisper
+        with use_whisper(self.model) as model:
+            result = model.transcribe(audio, initial_prompt=prompt, condition_on_previous_text=False)
+        return [(seg["text"].strip(), seg["end"]) for seg in result["segments"]]
+
+    def _run(self):
+        while not self._stop.wait(self.step_s):
+            end = self.capture.written
+            if end - self.cursor < self.min_frames:
+                continue
+            segments = self._decode(self.cursor, end)
+            self.passes += 1
+
+            stable = 0
+            for i, (text, _) in enumerate(segments[:-1]):
+                if i < len(self._previous) and self._previous[i] == text:
+                    stable = i + 1
+                else:
+                    break
+            # Never let the pending window grow past window_frames: commit all
+            # but the last segment, or everything when there is only one
+            overflow = end - self.cursor > self.window_frames
+            if overflow:
+                stable = max(stable, len(segments) - 1) or len(segments)
+
+            if stable:
+                self.committed.extend(text for text, _ in segments[:stable] if text)
+                print(f"📝 Committed: {' '.join(self.committed)}")
+            if overflow and stable == len(segments):
+                # Nothing left pending (or nothing decodable): skip to the end
+                self.cursor = end
+            elif stable:
+                self.cursor += int(segments[stable - 1][1] * self.capture.samplerate)
+            self._previous = [text for text, _ in segments[stable:]]
+
+    def cancel(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def finish(self, end=None):
+        self.cancel()
+        end = self.capture.written if end is None else end
+        start = time.perf_counter()
+        tail = []
+        if end > self.cursor:
+            tail = [text for text, _ in self._decode(self.cursor, end) if text]
+        text = " ".join(self.committed + tail)
+        elapsed = time.perf_counter() - start
+        metrics.record("stt", elapsed, "local")
+        print(f"⏱️ Final STT pass took {elapsed:.2f}s after {self.passes} live passes")
+        return text
+
+class SegmentTranscriber:
+    # Cuts the live capture at pauses and hands each closed segment to a worker
+    # pool (concurrent cloud requests, or local decoders) while the user keeps
+    # talking. When recording stops only the last segment is left, so the wait
+    # scales with the longest segment rather than the whole recording. Texts
+    # are joined in capture order.
+
+    def __init__(self, capture, transcribe, vad, workers=2, min_gap_ms=400, min_segment_s=4.0,
+                 max_segment_s=20.0, frame_ms=30, backend="local"):
+        self.capture = capture
+        self.transcribe = transcribe
+        self.vad = vad
+        self.backend = backend
+        self.frame_len = int(capture.samplerate * frame_ms / 1000)
+        self.gap_frames = max(1, int(min_gap_ms / frame_ms))
+        self.min_frames = int(min_segment_s * capture.samplerate)
+        self.max_frames = int(max_segment_s * capture.samplerate)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt-segment")
+        self.futures = []
+        self.segment_start = 0
+        self.segment_speech = 0
+        self.silence_run = 0
+        self.checked = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.segment_start = self.checked = self.capture.start_frame
+        self._stop.clear()
+        # Segments are sent in copies of the caller's context, which carries the barge-in token
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run,), daemon=True)
+        self._thread.start()
+
+    def _cut(self, end, force=False):
+        # Pause-closed segments without any speech are dropped: Whisper invents
+        # text for silence. Max-length cuts are forced, as a VAD miss there
+        # could be half a sentence.
+        seconds = (end - self.segment_start) / self.capture.samplerate
+        if self.segment_speech or force:
+            pcm = self.capture.read(self.segment_start, end)
+            self.futures.append(self.executor.submit(contextvars.copy_context().run, self.transcribe, pcm, self.capture.samplerate))
+            print(f"✂️ Segment {len(self.futures)}: {seconds:.1f}s")
+        else:
+            print(f"🔇 Dropped {seconds:.1f}s without speech")
+        self.segment_start = end
+        self.segment_speech = 0
+        self.silence_run = 0
+
+    def _scan(self, end):
+        n_frames = (end - self.checked) // self.frame_len
+        if not n_frames:
+            return
+        pcm = self.capture.read(self.checked, self.checked + n_frames * self.frame_len)
+        frames = to_mono_float32(pcm, self.capture.samplerate, self.capture.samplerate)
+        speech = self.vad.is_speech(frames.reshape(n_frames, self.frame_len))
+        for i, is_speech in enumerate(speech):
+            pos = self.checked + (i + 1) * self.frame_len
+            if is_speech:
+                self.segment_speech += 1
+                self.silence_run = 0
+            else:
+                self.silence_run += 1
+            length = pos - self.segment_start
+            if self.silence_run >= self.gap_frames and length >= self.min_frames:
+                # Cut in the middle of the pause so neither side loses a word edge
+                self._cut(pos - self.silence_run * self.frame_len // 2)
+            elif length >= self.max_frames:
+                self._cut(pos, force=True)
+        self.checked += n_frames * self.frame_len
+
+    def _run(self):
+        while not self._stop.wait(0.1):
+            self._scan(self.capture.written)
+
+    def _stop_watching(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def cancel(self):
+        self._stop_watching()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def finish(self, end=None):
+        self._stop_watching()
+        end = self.capture.written if end is None else end
+        start = time.perf_counter()
+        early = len(self.futures)
+        self._scan(end)
+        if end > self.segment_start:
+            # With nothing sent yet, the endpointer's speech is trusted over the VAD's
+            self._cut(end, force=not self.futures)
+        try:
+            texts = [future.result().strip() for future in self.futures]
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        elapsed = time.perf_counter() - start
+        metrics.record("stt", elapsed, self.backend)
+        print(f"⏱️ Final STT took {elapsed:.2f}s for {len(self.futures)} segments ({early} sent while recording)")
+        return " ".join(text for text in texts if text)
+
+def live_transcriber(client, config, online, model=None):
+    # A transcriber that works during recording, for the ringbuffer capture;
+    # None means transcribe the finished recording in one go
+    if config.CAPTURE_BACKEND != "ringbuffer":
+        return None
+    from io_audio import get_capture
+    from vad import load_vad
+    capture = get_capture(config)
+    if config.SEGMENT_STT:
+        segments = dict(
+            vad=load_vad(config),
+            min_gap_ms=config.SEGMENT_MIN_GAP_MS,
+            min_segment_s=config.SEGMENT_MIN_SECONDS,
+            max_segment_s=config.SEGMENT_MAX_SECONDS,
+            frame_ms=config.VAD_FRAME_MS
+        )
+        if online:
+            from online_logic import transcribe_audio
+            return SegmentTranscriber(
+                capture,
+                lambda pcm, rate: transcribe_audio(client, pcm, rate, stage="stt_segment"),
+                workers=config.SEGMENT_CLOUD_CONCURRENCY,
+                backend="online",
+                **segments
+            )
+        import stt_backends
+        from offline_logic import transcribe_audio_local
+        return SegmentTranscriber(
+            capture,
+            lambda pcm, rate: transcribe_audio_local(model, pcm, rate, stage="stt_segment"),
+            workers=model.workers if model else stt_backends.workers(),
+            backend="local",
+            **segments
+        )
+    if config.STREAMING_STT and not online:
+        return IncrementalTranscriber(
+            model,
+            capture,
+            window_s=config.STREAMING_STT_WINDOW,
+            step_s=config.STREAMING_STT_STEP
+        )
+    return None
@@ -0,0 +1,64 @@
+import queue
+import re
+import threading
+import time
+
+import barge_in
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+def sentence_chunks(deltas, min_chars=20):
+    # Cut a stream of text deltas at sentence boundaries. Very short sentences
+    # ("Sure.") are glued to the next one so TTS isn't called for a single word.
+    buffer = ""
+    for delta in deltas:
+        buffer += delta
+        while True:
+            m = _SENTENCE_END.search(buffer, min(min_chars, len(buffer)))
+            if not m:
+                break
+            sentence = buffer[:m.start()].strip()
+            buffer = buffer[m.end():]
+            if sentence:
+                yield sentence
+    if buffer.strip():
+        yield buffer.strip()
+
+def speak_streamed(chunks, synthesize, play, on_first_audio=None):
+    # Synthesize each chunk as soon as it's complete while a player thread
+    # works through the queue, so speech starts after the first sentence.
+    audio_q = queue.Queue()
+    start = time.perf_counter()
+    token = barge_in.token()
+
+    def player():
+        first = True
+        while True:
+            path = audio_q.get()
+            if path is None:
+                break
+            if token.is_set():
+                continue
+            if first:
+                first = False
+                print(f"⏱️ Time to first audio: {time.perf_counter() - start:.2f}s")
+                if on_first_audio:
+                    on_first_audio()
+            play(path)
+
+    t = threading.Thread(target=player, daemon=True)
+    t.start()
+
+    spoken = []
+    try:
+        for sentence in chunks:
+            if barge_in.cancelled():
+                break
+            spoken.append(sentence)
+            path = synthesize(sentence)
+            if path:
+                audio_q.put(path)
+    finally:
+        audio_q.put(None)
+        t.join()
+    return " ".join(spoken)
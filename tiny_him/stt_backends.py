@@ -0,0 +1,128 @@
+import importlib.util
+import os
+import threading
+
+import config
+
+# Local speech-to-text engines behind one interface. transcribe() takes 16 kHz
+# mono float32 audio (or a file path) and returns Whisper's result shape,
+# {"text": ..., "segments": [{"start", "end", "text"}, ...]}, so callers such
+# as the incremental transcriber don't care which engine is loaded.
+#
+#   whisper         reference openai-whisper on PyTorch (fp32 on CPU)
+#   faster-whisper  CTranslate2 with int8 weights, usually several times
+#                   faster and smaller on the Pi's Cortex-A76 cores
+
+class WhisperBackend:
+    name = "whisper"
+    workers = 1     # its decoder installs hooks on the module while decoding
+
+    def __init__(self, model_size="base", threads=None, beam_size=1, language="en"):
+        import torch
+        import whisper
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = whisper.load_model(model_size, device="cpu")
+        self.beam_size = beam_size
+        self.language = language
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio, initial_prompt=None, condition_on_previous_text=True):
+        options = {"beam_size": self.beam_size} if self.beam_size > 1 else {}
+        with self._lock:
+            result = self.model.transcribe(
+                audio,
+                language=self.language,
+                fp16=False,
+                initial_prompt=initial_prompt,
+                condition_on_previous_text=condition_on_previous_text,
+                **options
+            )
+        return {
+            "text": result["text"],
+            "segments": [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in result["segments"]],
+        }
+
+class FasterWhisperBackend:
+    name = "faster-whisper"
+
+    def __init__(self, model_size="base", threads=None, beam_size=1, language="en", compute_type="int8", workers=1):
+        from faster_whisper import WhisperModel
+        # workers > 1 lets that many threads decode at once on shared weights,
+        # each with all the threads, so a lone whole-recording pass isn't slowed
+        self.workers = workers
+        self.model = WhisperModel(
+            model_size,
+            device="cpu",
+            compute_type=compute_type,
+            cpu_threads=threads or 0,
+            num_workers=workers
+        )
+        self.beam_size = beam_size
+        self.language = language
+
+    def transcribe(self, audio, initial_prompt=None, condition_on_previous_text=True):
+        segments, _ = self.model.transcribe(
+            audio,
+            language=self.language,
+            beam_size=self.beam_size,
+            initial_prompt=initial_prompt,
+            condition_on_previous_text=condition_on_previous_text
+        )
+        # segments is a generator: decoding happens while iterating it
+        segments = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+        return {"text": "".join(s["text"] for s in segments), "segments": segments}
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+MODULES = {WhisperBackend.name: "whisper", FasterWhisperBackend.name: "faster_whisper"}
+
+def available(name):
+    # Installed, without paying for the import
+    return importlib.util.find_spec(MODULES[name]) is not None
+
+# Rough resident size in MB by model size, fp32 PyTorch; int8 CTranslate2 needs about a third
+APPROX_MB = {"tiny": 150, "base": 300, "small": 900, "medium": 2500}
+
+def estimate_mb(name=None, model_size=None):
+    name = name or config.STT_BACKEND
+    size = APPROX_MB.get((model_size or config.MODEL_SIZE).split(".")[0], 1000)
+    if name == FasterWhisperBackend.name:
+        return size / 3 if config.STT_COMPUTE_TYPE.startswith("int8") else size
+    return size
+
+def workers(name=None):
+    # Concurrent transcribe() calls the configured backend serves, without loading it
+    name = name or config.STT_BACKEND
+    if name == FasterWhisperBackend.name and available(name):
+        return max(1, config.STT_WORKERS)
+    return WhisperBackend.workers
+
+def default_threads():
+    return config.STT_THREADS or os.cpu_count()
+
+def load(name=None, model_size=None, threads=None, beam_size=None, language=None, compute_type=None, workers=None,
+         fallback=True):
+    # fallback=False raises instead of loading reference Whisper in place of faster-whisper
+    name = name or config.STT_BACKEND
+    options = {
+        "model_size": model_size or config.MODEL_SIZE,
+        "threads": threads or default_threads(),
+        "beam_size": beam_size or config.STT_BEAM_SIZE,
+        "language": language if language is not None else config.STT_LANGUAGE,
+    }
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown STT backend {name!r}, expected one of {', '.join(BACKENDS)}")
+    if name == FasterWhisperBackend.name:
+        if available(name):
+            options["compute_type"] = compute_type or config.STT_COMPUTE_TYPE
+            options["workers"] = max(1, workers or config.STT_WORKERS)
+        elif fallback:
+            print("⚠️ faster-whisper not installed, falling back to reference Whisper")
+            name = WhisperBackend.name
+        else:
+            raise ImportError("faster-whisper not installed")
+    print(f"🔍 Loading {name} STT ({options['model_size']}, {options['threads']} threads)")
+    return BACKENDS[name](**options)
@@ -0,0 +1,118 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import wave
+
+# Compares the local STT backends on the fixture WAV. Each backend runs in its
+# own process so resident memory isn't shared between models, and reports
+# load time, real-time factor (decode time / audio duration, below 1 is
+# faster than real time) and RSS after loading and at peak.
+#
+#   python3 stt_benchmark.py --runs 5 --threads 4 --beam-size 1
+
+import numpy as np
+
+import config
+import stt_backends
+from capture import to_mono_float32
+from models import process_memory
+
+def load_fixture(path):
+    with wave.open(path, "rb") as w:
+        pcm = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16).reshape(-1, w.getnchannels())
+        rate = w.getframerate()
+    return to_mono_float32(pcm, rate)
+
+def run_worker(args):
+    audio = load_fixture(args.fixture)
+    duration = len(audio) / 16000
+    baseline, _ = process_memory()
+
+    start = time.perf_counter()
+    backend = stt_backends.load(
+        args.worker,
+        model_size=args.model_size,
+        threads=args.threads,
+        beam_size=args.beam_size,
+        compute_type=args.compute_type,
+        fallback=False
+    )
+    load_time = time.perf_counter() - start
+    loaded, _ = process_memory()
+
+    # First pass warms caches and allocators and isn't counted
+    text = backend.transcribe(audio)["text"].strip()
+    times = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        backend.transcribe(audio)
+        times.append(time.perf_counter() - start)
+    _, peak = process_memory()
+
+    print(json.dumps({
+        "backend": backend.name,
+        "load_time": load_time,
+        "rtf": [t / duration for t in times],
+        "model_mb": loaded - baseline if loaded is not None else None,
+        "peak_mb": peak,
+        "text": text,
+    }))
+
+def run_backend(name, args):
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", name,
+           "--fixture", args.fixture, "--runs", str(args.runs)]
+    for flag, value in (("--model-size", args.model_size), ("--threads", args.threads),
+                        ("--beam-size", args.beam_size), ("--compute-type", args.compute_type)):
+        if value is not None:
+            cmd += [flag, str(value)]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(f"⚠️ {name} failed:\n{proc.stderr.strip()}")
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Real-time factor and memory of the local STT backends")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--fixture", default=os.path.join(os.path.dirname(__file__), "..", "input.wav"))
+    parser.add_argument("--backend", action="append", choices=sorted(stt_backends.BACKENDS),
+                        help="backend to run (repeatable, default: all)")
+    parser.add_argument("--model-size", default=None)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--beam-size", type=int, default=None)
+    parser.add_argument("--compute-type", default=None)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.runs < 1:
+        parser.error("--runs must be at least 1")
+    args.fixture = os.path.abspath(args.fixture)
+
+    if args.worker:
+        return run_worker(args)
+
+    with wave.open(args.fixture, "rb") as w:
+        duration = w.getnframes() / w.getframerate()
+    results = []
+    for name in args.backend or stt_backends.BACKENDS:
+        if not stt_backends.available(name):
+            # load() would run another backend under this name
+            print(f"⏭️ {name} not installed, skipping")
+            continue
+        result = run_backend(name, args)
+        if result:
+            results.append(result)
+
+    print(f"\n📊 {args.runs} runs per backend on {os.path.basename(args.fixture)} ({duration:.1f}s of audio), "
+          f"model {args.model_size or config.MODEL_SIZE}")
+    for r in results:
+        rtf = sorted(r["rtf"])
+        model_mb = f"{r['model_mb']:.0f}MB" if r["model_mb"] is not None else "n/a"
+        print(f"{r['backend']:<16} RTF p50={rtf[len(rtf) // 2]:.2f} min={rtf[0]:.2f}  "
+              f"load={r['load_time']:.1f}s  model RSS={model_mb}  peak RSS={r['peak_mb']:.0f}MB")
+        print(f"{'':<16} \"{r['text']}\"")
+
+if __name__ == "__main__":
+    sys.exit(main())
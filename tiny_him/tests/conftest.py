@@ -0,0 +1,5 @@
+import os
+import sys
+
+# tiny_him's modules import each other by bare name, as when run from tiny_him/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+import pytest
+
+import answer_cache
+import config
+
+@pytest.fixture(autouse=True)
+def cache_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "ANSWER_CACHE_PATH", str(tmp_path / "answer_cache.json"))
+    monkeypatch.setattr(config, "ANSWER_CACHE_SEMANTIC", False)
+    monkeypatch.setattr(config, "ANSWER_CACHE_CONTEXT_FREE", True)
+    monkeypatch.setattr(config, "ANSWER_CACHE_SAVE_DELAY", 3600)
+    monkeypatch.setattr(answer_cache, "_entries", None)
+    monkeypatch.setattr(answer_cache, "_matrix", None)
+    return tmp_path
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    # Fixed unit vectors instead of sentence-transformers
+    vectors = {}
+
+    def embed(text):
+        vec = np.asarray(vectors[text], dtype=np.float32)
+        return vec / np.linalg.norm(vec)
+    monkeypatch.setattr(answer_cache, "_embed", embed)
+    monkeypatch.setattr(config, "ANSWER_CACHE_SEMANTIC", True)
+    monkeypatch.setattr(config, "ANSWER_CACHE_SIMILARITY", 0.9)
+    return vectors
+
+def test_exact_match_ignores_case_and_punctuation():
+    answer_cache.store("What is the capital of France?", "Paris.")
+    assert answer_cache.lookup("what is the capital of france") == "Paris."
+    assert answer_cache.lookup("What is the capital of Spain?") is None
+
+def test_time_dependent_questions_are_never_cached():
+    answer_cache.store("What's the weather like?", "Sunny.")
+    assert answer_cache.lookup("What's the weather like?") is None
+
+def test_entries_survive_a_reload():
+    answer_cache.store("Who wrote Hamlet?", "Shakespeare.")
+    answer_cache._entries = None
+    assert answer_cache.lookup("Who wrote Hamlet?") == "Shakespeare."
+
+def test_expired_entries_are_dropped(monkeypatch):
+    answer_cache.store("Who wrote Hamlet?", "Shakespeare.")
+    monkeypatch.setattr(config, "ANSWER_CACHE_TTL", 10)
+    answer_cache._entries["who wrote hamlet"]["created"] = time.time() - 11
+    assert answer_cache.lookup("Who wrote Hamlet?") is None
+
+def test_semantic_match_respects_the_threshold(embeddings):
+    embeddings["how tall is mount everest"] = [1.0, 0.0]
+    embeddings["what is the height of mount everest"] = [0.95, 0.1]     # cosine ~0.99
+    embeddings["how deep is the mariana trench"] = [0.6, 0.8]           # cosine 0.6
+    answer_cache.store("How tall is Mount Everest?", "8849 metres.")
+    assert answer_cache.lookup("What is the height of Mount Everest?") == "8849 metres."
+    assert answer_cache.lookup("How deep is the Mariana Trench?") is None
+
+def test_answers_are_kept_per_history():
+    answer_cache.store("What is the capital of France?", "Paris.", context="abc")
+    assert answer_cache.lookup("What is the capital of France?", "abc") == "Paris."
+    assert answer_cache.lookup("What is the capital of France?", "def") is None
+    assert answer_cache.lookup("What is the capital of France?") is None
+
+def test_mid_conversation_questions_match_history_free_answers(monkeypatch):
+    answer_cache.store("What is the capital of France?", "Paris.")
+    assert answer_cache.lookup("What is the capital of France?", "abc") == "Paris."
+    monkeypatch.setattr(config, "ANSWER_CACHE_CONTEXT_FREE", False)
+    assert answer_cache.lookup("What is the capital of France?", "abc") is None
+
+def test_follow_ups_never_match_history_free_answers():
+    answer_cache.store("What is its population?", "About 2 million.")
+    assert answer_cache.lookup("What is its population?", "abc") is None
+
+def test_semantic_match_stays_within_the_history(embeddings):
+    embeddings["how tall is mount everest"] = [1.0, 0.0]
+    embeddings["what is the height of mount everest"] = [0.95, 0.1]
+    answer_cache.store("How tall is Mount Everest?", "8849 metres.", context="abc")
+    assert answer_cache.lookup("What is the height of Mount Everest?", "def") is None
+    assert answer_cache.lookup("What is the height of Mount Everest?", "abc") == "8849 metres."
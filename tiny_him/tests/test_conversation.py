@@ -0,0 +1,132 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import config
+import conversation
+import llm_engine
+
+@pytest.fixture(autouse=True)
+def history(monkeypatch):
+    # One token per word keeps the budgets easy to follow
+    monkeypatch.setattr(conversation, "count_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(config, "HISTORY_ENABLED", True)
+    monkeypatch.setattr(config, "HISTORY_IDLE_RESET", 600)
+    monkeypatch.setattr(config, "HISTORY_TOKEN_BUDGET", 20)
+    monkeypatch.setattr(config, "HISTORY_LOCAL_TOKEN_BUDGET", 8)
+    conversation.reset()
+    yield
+    conversation.reset()
+
+class FakeClient:
+    def __init__(self, summary="They talked about France."):
+        self.requests = []
+        self.summary = summary
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages):
+        self.requests.append(messages[0]["content"])
+        message = SimpleNamespace(content=self.summary)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def add_turns(n, words=2):
+    # Each turn costs 2 * words tokens
+    for i in range(n):
+        conversation.add_turn(" ".join([f"q{i}"] * words), " ".join([f"a{i}"] * words))
+
+def wait_for_compaction():
+    deadline = time.monotonic() + 2
+    while conversation._compacting and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not conversation._compacting
+
+def test_messages_keep_the_newest_turns_within_budget():
+    add_turns(6)        # 4 tokens each, 20 fit
+    msgs = conversation.messages("", "next")
+    assert msgs[0] == {"role": "user", "content": "q1 q1"}
+    assert msgs[-1] == {"role": "user", "content": "next"}
+    assert len(msgs) == 5 * 2 + 1
+
+def test_empty_system_prompt_is_left_out():
+    assert conversation.messages("", "hi") == [{"role": "user", "content": "hi"}]
+    assert conversation.messages("Be brief.", "hi")[0] == {"role": "system", "content": "Be brief."}
+
+def test_local_prompt_uses_its_smaller_budget_and_keeps_the_prefix():
+    add_turns(3)
+    prompt = conversation.prompt("SYSTEM\n", "next")
+    assert prompt.startswith("SYSTEM\n")
+    assert "q2" in prompt and "q1" in prompt and "q0" not in prompt
+    assert prompt.endswith("User: next\nYou:")
+
+def test_idle_pause_starts_over(monkeypatch):
+    add_turns(1)
+    assert conversation.digest()
+    monkeypatch.setattr(conversation, "_last_turn", time.time() - 601)
+    assert conversation.digest() == ""
+    assert conversation.is_fresh()
+
+def test_digest_follows_the_history():
+    assert conversation.digest() == ""
+    add_turns(1)
+    first = conversation.digest()
+    add_turns(1)
+    assert conversation.digest() not in ("", first)
+
+def test_no_compaction_within_budget():
+    add_turns(5)        # exactly 20 tokens
+    client = FakeClient()
+    conversation.compact_async(client, online=True)
+    wait_for_compaction()
+    assert client.requests == []
+
+def test_compaction_folds_the_oldest_turns_into_the_summary():
+    add_turns(8)        # 32 tokens against a budget of 20
+    client = FakeClient("France, Paris.")
+    conversation.compact_async(client, online=True)
+    wait_for_compaction()
+    assert len(client.requests) == 1
+    assert "q0" in client.requests[0]
+    summary, turns = conversation._recent(100)
+    assert summary == "France, Paris."
+    # What's left fits half of what the summary leaves of the budget
+    assert sum(t["tokens"] for t in turns) <= (20 - 2) // 2
+    assert turns[-1]["user"] == "q7 q7"
+
+def test_local_compaction_is_capped_to_one_budget(monkeypatch):
+    add_turns(6)        # 24 tokens against a local budget of 8
+    prompts = []
+
+    def complete(prompt, **kwargs):
+        prompts.append(prompt)
+        assert kwargs.get("background")
+        return "summary"
+    monkeypatch.setattr(llm_engine, "complete", complete)
+    conversation.compact_async(None, online=False)
+    wait_for_compaction()
+    assert len(prompts) == 1
+    assert "q1" in prompts[0] and "q2" not in prompts[0]
+    summary, turns = conversation._recent(100)
+    assert summary == "summary"
+    assert turns[0]["user"] == "q2 q2"
+
+def test_postponed_local_compaction_keeps_the_turns(monkeypatch):
+    add_turns(6)
+    monkeypatch.setattr(llm_engine, "complete", lambda prompt, **kwargs: None)
+    conversation.compact_async(None, online=False)
+    wait_for_compaction()
+    summary, turns = conversation._recent(100)
+    assert summary == "" and len(turns) == 6
+
+def test_reset_during_compaction_discards_the_summary():
+    add_turns(8)
+    client = FakeClient()
+    original = client.create
+
+    def create(model, messages):
+        conversation.reset()
+        return original(model, messages)
+    client.chat.completions.create = create
+    conversation.compact_async(client, online=True)
+    wait_for_compaction()
+    assert conversation._recent(100) == ("", [])
@@ -0,0 +1,106 @@
+import pytest
+
+import config
+import health
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(health.time, "monotonic", clock)
+    return clock
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(health, "breakers", {
+        stage: health.CircuitBreaker(stage, failure_threshold=2, reset_timeout=30.0) for stage in health.STAGES
+    })
+    monkeypatch.setattr(health, "local_available", dict.fromkeys(health.STAGES, True))
+    monkeypatch.setattr(health, "online", True)
+    monkeypatch.setattr(config, "HEDGE_ENABLED", False)
+
+def test_breaker_opens_after_the_failure_threshold(clock):
+    breaker = health.CircuitBreaker("llm", failure_threshold=2, reset_timeout=30.0)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+def test_success_resets_the_failure_count(clock):
+    breaker = health.CircuitBreaker("llm", failure_threshold=2, reset_timeout=30.0)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+def test_breaker_half_opens_after_the_cooldown(clock):
+    breaker = health.CircuitBreaker("llm", failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    clock.now += 29
+    assert breaker.state == "open"
+    clock.now += 2
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+def test_half_open_trial_decides(clock):
+    breaker = health.CircuitBreaker("llm", failure_threshold=3, reset_timeout=30.0)
+    breaker.trip()
+    clock.now += 31
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 31
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_outage_trips_every_breaker_and_recovery_half_opens_them(clock, monkeypatch):
+    monkeypatch.setattr(health, "probe", lambda: False)
+    assert health.check() is False
+    assert all(b.state == "open" for b in health.breakers.values())
+    assert health.plan() == dict.fromkeys(health.STAGES, False)
+
+    clock.now += 5
+    monkeypatch.setattr(health, "probe", lambda: True)
+    assert health.check() is True
+    assert all(b.state == "half_open" for b in health.breakers.values())
+    assert health.plan() == dict.fromkeys(health.STAGES, True)
+
+def test_recovery_leaves_breakers_opened_by_request_failures(clock, monkeypatch):
+    monkeypatch.setattr(health, "probe", lambda: True)
+    health.breakers["llm"].trip()
+    health.check()
+    assert health.breakers["llm"].state == "open"
+
+def test_stage_without_local_backend_always_goes_online(clock):
+    health.local_available["tts"] = False
+    health.breakers["tts"].trip()
+    assert health.use_online("tts")
+
+def test_call_falls_back_and_reports_who_served(clock):
+    def failing():
+        raise ConnectionError("down")
+    served = {}
+    assert health.call("llm", failing, lambda: "local answer", served=served) == "local answer"
+    assert served == {"llm": "local"}
+    assert health.breakers["llm"].failures == 1
+
+    served = {}
+    assert health.call("llm", lambda: "online answer", lambda: "local answer", served=served) == "online answer"
+    assert served == {"llm": "online"}
+    assert health.breakers["llm"].failures == 0
+
+def test_stream_does_not_fall_back_once_items_were_yielded(clock):
+    def half_stream():
+        yield "Hello"
+        raise ConnectionError("reset")
+    items = []
+    with pytest.raises(ConnectionError):
+        for item in health.stream("llm", half_stream, lambda: iter(["local"])):
+            items.append(item)
+    assert items == ["Hello"]
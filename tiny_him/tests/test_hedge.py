@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+import config
+import hedge
+import metrics
+
+@pytest.fixture(autouse=True)
+def short_deadline(monkeypatch):
+    monkeypatch.setattr(config, "METRICS_ENABLED", True)
+    monkeypatch.setattr(config, "HEDGE_DEFAULT_DEADLINE", 0.1)
+    monkeypatch.setattr(config, "HEDGE_MIN_SAMPLES", 10)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+def slow(value, seconds=1.0):
+    def fn():
+        time.sleep(seconds)
+        return value
+    return fn
+
+def failing(message="down"):
+    def fn():
+        raise ConnectionError(message)
+    return fn
+
+def test_fast_online_answer_never_starts_local():
+    local_started = threading.Event()
+
+    def local():
+        local_started.set()
+        return "local"
+    served = {}
+    assert hedge.call("stt", lambda: "online", local, served) == "online"
+    assert served == {"stt": "online"}
+    assert not local_started.is_set()
+    assert hedge.win_rates() == {"stt": {"unhedged": 1.0}}
+
+def test_slow_online_is_overtaken_by_local():
+    served = {}
+    start = time.perf_counter()
+    assert hedge.call("stt", slow("online"), lambda: "local", served) == "local"
+    assert time.perf_counter() - start < 0.8
+    assert served == {"stt": "local"}
+    assert hedge.win_rates() == {"stt": {"local": 1.0}}
+
+def test_online_still_wins_once_local_has_started():
+    assert hedge.call("stt", slow("online", 0.2), slow("local"), {}) == "online"
+    assert hedge.win_rates() == {"stt": {"online": 1.0}}
+
+def test_online_error_starts_local_before_the_deadline(monkeypatch):
+    monkeypatch.setattr(config, "HEDGE_DEFAULT_DEADLINE", 5.0)
+    start = time.perf_counter()
+    assert hedge.call("llm", failing(), lambda: "local", {}) == "local"
+    assert time.perf_counter() - start < 1.0
+
+def test_local_error_leaves_online_to_answer():
+    assert hedge.call("stt", slow("online", 0.3), failing("no model"), {}) == "online"
+
+def test_both_failing_raises():
+    with pytest.raises(ConnectionError):
+        hedge.call("stt", failing("online down"), failing("local down"), {})
+
+def test_deadline_follows_the_online_percentile(monkeypatch):
+    assert hedge.deadline("stt") == 0.1
+    for seconds in range(1, 11):
+        metrics.record("stt", seconds / 10, "online")
+    monkeypatch.setattr(config, "HEDGE_PERCENTILE", 0.8)
+    assert hedge.deadline("stt") == pytest.approx(0.8)
+
+def test_stream_race_is_decided_by_the_first_item():
+    def online():
+        time.sleep(1.0)
+        yield "late"
+
+    def local():
+        yield "Hello"
+        yield " world"
+    served = {}
+    assert list(hedge.stream("llm", online, local, served)) == ["Hello", " world"]
+    assert served == {"llm": "local"}
+
+def test_losing_stream_is_closed():
+    closed = threading.Event()
+    produced = []
+
+    def online():
+        try:
+            time.sleep(0.3)
+            for item in ("late", "later", "latest"):
+                produced.append(item)
+                yield item
+        finally:
+            closed.set()
+
+    assert list(hedge.stream("llm", online, lambda: iter(["local"]), {})) == ["local"]
+    assert closed.wait(2.0)
+    assert len(produced) < 3
@@ -0,0 +1,48 @@
+import numpy as np
+
+from player import AudioPlayer
+
+class FakeStream:
+    latency = 0.0
+
+def player():
+    p = AudioPlayer(samplerate=1000, blocksize=4)
+    p._stream = FakeStream()
+    return p
+
+def block(p, frames=4):
+    out = np.full((frames, 1), -1.0, dtype=np.float32)
+    p._callback(out, frames, None, None)
+    return out[:, 0].tolist()
+
+def test_clips_play_back_to_back():
+    p = player()
+    p.enqueue(np.ones(3, dtype=np.float32))
+    p.enqueue(np.full(3, 2.0, dtype=np.float32))
+    assert block(p) == [1, 1, 1, 2]
+    assert block(p) == [2, 2, 0, 0]
+    assert p._idle.is_set()
+
+def test_flush_drops_the_playing_clip():
+    p = player()
+    p.enqueue(np.ones(10, dtype=np.float32))
+    assert block(p) == [1, 1, 1, 1]
+    p.flush()
+    assert p._idle.is_set()
+    assert block(p) == [0, 0, 0, 0]
+
+def test_clips_requested_before_a_flush_are_dropped():
+    p = player()
+    generation = p.generation()
+    p.flush()
+    # e.g. a decode that finished after the barge-in
+    assert not p.enqueue(np.ones(4, dtype=np.float32), generation)
+    assert p.enqueue(np.full(4, 2.0, dtype=np.float32))
+    assert block(p) == [2, 2, 2, 2]
+
+def test_stale_clip_already_queued_is_skipped():
+    p = player()
+    p._queue.put((np.ones(4, dtype=np.float32), None, p.generation()))
+    p._generation += 1
+    assert block(p) == [0, 0, 0, 0]
+    assert p._idle.is_set()
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from stream_stt import SegmentTranscriber
+
+RATE = 1000             # 30 ms frames of 30 samples keep positions readable
+
+class FakeCapture:
+    def __init__(self, pcm):
+        self.samplerate = RATE
+        self.start_frame = 0
+        self.pcm = pcm
+        self.written = len(pcm)
+
+    def read(self, start, end):
+        return self.pcm[start:end]
+
+class EnergyVAD:
+    def is_speech(self, frames):
+        return np.abs(frames).mean(axis=1) > 0.1
+
+def audio(*parts):
+    # ("speech" | "silence", seconds) pairs to int16 PCM
+    return np.concatenate([
+        np.full(int(seconds * RATE), 10000 if kind == "speech" else 0, dtype=np.int16)
+        for kind, seconds in parts
+    ])
+
+@pytest.fixture
+def segments():
+    cuts = []
+
+    def run(pcm, **options):
+        def transcribe(segment, samplerate):
+            cuts.append(len(segment))
+            return f"<{len(segment)}>"
+        transcriber = SegmentTranscriber(FakeCapture(pcm), transcribe, EnergyVAD(), workers=1, **options)
+        transcriber.segment_start = transcriber.checked = 0
+        # Scanned in uneven slices, as the watcher thread would see the capture
+        for end in range(0, len(pcm), 470):
+            transcriber._scan(end)
+        text = transcriber.finish(len(pcm))
+        return cuts, text
+    return run
+
+def test_cut_lands_inside_the_pause(segments):
+    cuts, text = segments(audio(("speech", 5), ("silence", 1), ("speech", 2)))
+    assert len(cuts) == 2
+    assert 5000 < cuts[0] < 6000
+    assert sum(cuts) == 8000
+    assert text == " ".join(f"<{n}>" for n in cuts)
+
+def test_short_pauses_do_not_cut(segments):
+    cuts, _ = segments(audio(("speech", 5), ("silence", 0.2), ("speech", 2)))
+    assert cuts == [7200]
+
+def test_no_cut_before_the_minimum_length(segments):
+    cuts, _ = segments(audio(("speech", 2), ("silence", 1), ("speech", 2)))
+    assert cuts == [5000]
+
+def test_long_speech_is_cut_at_the_maximum_length(segments):
+    cuts, _ = segments(audio(("speech", 25)), max_segment_s=10.0)
+    # At the first frame boundary past the limit
+    assert len(cuts) == 3
+    assert all(10000 <= n < 10000 + 30 for n in cuts[:2])
+    assert sum(cuts) == 25000
+
+def test_silent_segments_are_dropped(segments):
+    cuts, _ = segments(audio(("silence", 6), ("speech", 3)))
+    # Part of the leading silence is closed at a pause without speech and
+    # not sent; the segment that is sent has all of the speech
+    assert len(cuts) == 1
+    assert 3000 < cuts[0] < 9000
+
+def test_all_silence_is_still_sent_when_nothing_else_was(segments):
+    cuts, _ = segments(audio(("silence", 2)))
+    assert cuts == [2000]
+
+def test_max_length_cuts_are_never_dropped(segments):
+    # A VAD that misses speech must not lose a whole max-length segment
+    cuts, _ = segments(audio(("silence", 12)), min_segment_s=30.0, max_segment_s=10.0)
+    assert len(cuts) == 1
+    assert 10000 <= cuts[0] < 10000 + 30
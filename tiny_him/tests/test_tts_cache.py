@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+import config
+import tts_cache
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TTS_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "TTS_CACHE_MAX_BYTES", 250)
+    monkeypatch.setattr(tts_cache, "_index", None)
+    monkeypatch.setattr(tts_cache, "_total_bytes", 0)
+    return tmp_path
+
+def renderer(size=100):
+    calls = []
+
+    def render(path):
+        calls.append(path)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        return path
+    return render, calls
+
+def test_second_request_is_served_from_the_cache():
+    render, calls = renderer()
+    first = tts_cache.get_or_create("Hello there.", "espeak", None, None, ".wav", render)
+    second = tts_cache.get_or_create("Hello there.", "espeak", None, None, ".wav", render)
+    assert first == second
+    assert len(calls) == 1
+
+def test_key_covers_engine_voice_and_model():
+    keys = {
+        tts_cache.cache_key("Hi", "openai", "nova", "tts-1"),
+        tts_cache.cache_key("Hi", "openai", "alloy", "tts-1"),
+        tts_cache.cache_key("Hi", "openai", "nova", "tts-1-hd"),
+        tts_cache.cache_key("Hi", "piper", "nova", "tts-1"),
+    }
+    assert len(keys) == 4
+    assert tts_cache.cache_key(" Hi ", "piper", None, None) == tts_cache.cache_key("Hi", "piper", None, None)
+
+def test_least_recently_used_clip_is_evicted():
+    render, _ = renderer()
+    a = tts_cache.get_or_create("a", "espeak", None, None, ".wav", render)
+    b = tts_cache.get_or_create("b", "espeak", None, None, ".wav", render)
+    assert tts_cache.lookup("a", "espeak", None, None) == a
+    c = tts_cache.get_or_create("c", "espeak", None, None, ".wav", render)
+    assert not os.path.exists(b)
+    assert os.path.exists(a) and os.path.exists(c)
+    assert tts_cache._total_bytes == 200
+
+def test_newest_clip_is_kept_even_when_alone_over_budget():
+    render, _ = renderer(size=1000)
+    path = tts_cache.get_or_create("long", "espeak", None, None, ".wav", render)
+    assert os.path.exists(path)
+
+def test_index_is_rebuilt_from_disk_oldest_first(cache_dir):
+    render, _ = renderer()
+    a = tts_cache.get_or_create("a", "espeak", None, None, ".wav", render)
+    b = tts_cache.get_or_create("b", "espeak", None, None, ".wav", render)
+    os.utime(a, (1, 1))
+    os.utime(b, (2, 2))
+    tts_cache._index = None
+    assert tts_cache.lookup("a", "espeak", None, None) == a
+    assert [path for path, _ in tts_cache._index.values()] == [b, a]
+    assert tts_cache._total_bytes == 200
+
+def test_failed_render_is_not_cached(cache_dir):
+    path = tts_cache.get_or_create("x", "espeak", None, None, ".wav", lambda path: None)
+    assert path is None
+    assert tts_cache.lookup("x", "espeak", None, None) is None
@@ -0,0 +1,143 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import time
+
+import barge_in
+import config
+import health
+
+_http_client = None
+_client = None
+_async_http_client = None
+_async_client = None
+_loop = None
+_base_url = None
+_last_used = 0.0
+_timing = contextvars.ContextVar("transport_timing", default=None)
+_refresh_thread = None
+
+def _mark_used(*args):
+    global _last_used
+    _last_used = time.monotonic()
+
+async def _on_request(request):
+    # httpcore's trace hook sees the request go out on the connection and the
+    # response headers come back, which is what run(timing=...) reports
+    _mark_used()
+    timing = _timing.get()
+    if timing is None:
+        return
+
+    async def trace(event, info):
+        if event.endswith(".send_request_headers.started"):
+            timing["sent"] = time.perf_counter()
+        elif event.endswith(".receive_response_headers.complete"):
+            timing["headers"] = time.perf_counter()
+
+    request.extensions["trace"] = trace
+
+def build_client():
+    # OpenAI client on a shared keep-alive pool, so STT, chat and TTS requests
+    # reuse warm TCP/TLS connections instead of opening new ones
+    global _http_client, _client, _async_http_client, _async_client, _base_url
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
+
+    http2 = config.HTTP_HTTP2
+    if http2:
+        try:
+            import h2
+        except ImportError:
+            print("⚠️ h2 not installed, falling back to HTTP/1.1")
+            http2 = False
+
+    options = dict(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            config.HTTP_READ_TIMEOUT,
+            connect=config.HTTP_CONNECT_TIMEOUT
+        )
+    )
+    _http_client = httpx.Client(event_hooks={"request": [_mark_used]}, **options)
+    _client = OpenAI(http_client=_http_client, max_retries=config.HTTP_MAX_RETRIES)
+    # Its async twin on its own pool and event loop serves run(), so a barge-in
+    # can cancel a blocking request instead of waiting for the response
+    _async_http_client = httpx.AsyncClient(event_hooks={"request": [_on_request]}, **options)
+    _async_client = AsyncOpenAI(http_client=_async_http_client, max_retries=config.HTTP_MAX_RETRIES)
+    _base_url = str(_client.base_url)
+    return _client
+
+def _get_loop():
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        threading.Thread(target=_loop.run_forever, daemon=True).start()
+    return _loop
+
+class _PendingRequest:
+    # Registered with barge-in: closing it cancels the request, which drops its connection
+    def __init__(self, future):
+        self.future = future
+
+    def close(self):
+        self.future.cancel()
+
+async def _timed(request, timing):
+    _timing.set(timing)
+    return await request(_async_client)
+
+def run(client, request, timing=None):
+    # request(client) for a blocking API call, e.g.
+    #   transport.run(client, lambda c: c.chat.completions.create(...))
+    # With the client from build_client() it runs on the async twin and a
+    # barge-in aborts it with InterruptedError; any other client just blocks.
+    # A timing dict gets perf_counter() values for "sent" (request headers
+    # going out, after any connection setup) and "headers" (response headers
+    # in) of the last attempt.
+    if client is not _client or _async_client is None:
+        return request(client)
+    future = asyncio.run_coroutine_threadsafe(_timed(request, timing), _get_loop())
+    pending = _PendingRequest(future)
+    barge_in.register(pending)
+    try:
+        return future.result()
+    except concurrent.futures.CancelledError:
+        raise InterruptedError("interaction aborted") from None
+    finally:
+        barge_in.unregister(pending)
+
+def prewarm():
+    # Any response will do: the point is DNS, TCP and TLS setup on a pooled connection
+    if _http_client is None:
+        return
+    start = time.perf_counter()
+    try:
+        _http_client.head(_base_url, timeout=config.HTTP_CONNECT_TIMEOUT)
+        asyncio.run_coroutine_threadsafe(
+            _async_http_client.head(_base_url, timeout=config.HTTP_CONNECT_TIMEOUT), _get_loop()
+        ).result()
+        print(f"🔥 API connection warm ({(time.perf_counter() - start) * 1000:.0f} ms)")
+    except Exception as e:
+        print("⚠️ API pre-warm failed:", e)
+
+def prewarm_async():
+    threading.Thread(target=prewarm, daemon=True).start()
+
+def _refresh_loop():
+    while True:
+        time.sleep(config.HTTP_REFRESH_INTERVAL)
+        if health.online and time.monotonic() - _last_used >= config.HTTP_REFRESH_INTERVAL:
+            prewarm()
+
+def start_keepalive():
+    global _refresh_thread
+    if _refresh_thread is None and config.HTTP_REFRESH_INTERVAL:
+        _refresh_thread = threading.Thread(target=_refresh_loop, daemon=True)
+        _refresh_thread.start()
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import config
+
+_lock = threading.Lock()
+_index = None          # key -> (path, size), least recently used first
+_total_bytes = 0
+
+hits = 0
+misses = 0
+
+def cache_key(text, engine, voice, model):
+    raw = "\x00".join([engine, voice or "", model or "", text.strip()])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _load_index():
+    global _index, _total_bytes
+    _index = OrderedDict()
+    _total_bytes = 0
+    os.makedirs(config.TTS_CACHE_DIR, exist_ok=True)
+    entries = []
+    for name in os.listdir(config.TTS_CACHE_DIR):
+        path = os.path.join(config.TTS_CACHE_DIR, name)
+        if name.startswith(".") or not os.path.isfile(path):
+            continue
+        st = os.stat(path)
+        entries.append((st.st_mtime, os.path.splitext(name)[0], path, st.st_size))
+    for _, key, path, size in sorted(entries):
+        _index[key] = (path, size)
+        _total_bytes += size
+
+def _evict():
+    global _total_bytes
+    while _total_bytes > config.TTS_CACHE_MAX_BYTES and len(_index) > 1:
+        key, (path, size) = _index.popitem(last=False)
+        _total_bytes -= size
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def lookup(text, engine, voice, model):
+    # Path of the cached clip, or None (counted as a miss)
+    global hits, misses
+    key = cache_key(text, engine, voice, model)
+    with _lock:
+        if _index is None:
+            _load_index()
+        entry = _index.get(key)
+        if entry and os.path.exists(entry[0]):
+            _index.move_to_end(key)
+            os.utime(entry[0])
+            hits += 1
+            print(f"🗃️ TTS cache hit (hits={hits} misses={misses})")
+            return entry[0]
+        misses += 1
+    return None
+
+def get_or_create(text, engine, voice, model, ext, render):
+    # render(path) must write the clip to path. Cached clips are returned
+    # without calling it; the least recently used clips are evicted once the
+    # cache grows past TTS_CACHE_MAX_BYTES.
+    return lookup(text, engine, voice, model) or store(text, engine, voice, model, ext, render)
+
+def store(text, engine, voice, model, ext, render):
+    global _total_bytes
+    key = cache_key(text, engine, voice, model)
+    path = os.path.join(config.TTS_CACHE_DIR, key + ext)
+    tmp_path = os.path.join(config.TTS_CACHE_DIR, f".{key}.{threading.get_ident()}{ext}")
+    if not render(tmp_path) or not os.path.exists(tmp_path):
+        return None
+    os.replace(tmp_path, path)
+    size = os.path.getsize(path)
+
+    with _lock:
+        if _index is None:
+            _load_index()
+        old = _index.pop(key, None)
+        if old:
+            _total_bytes -= old[1]
+        _index[key] = (path, size)
+        _total_bytes += size
+        _evict()
+    print(f"🗃️ TTS cache miss (hits={hits} misses={misses}, {_total_bytes / 1e6:.1f} MB cached)")
+    return path
+
+def warm_up(phrases, synthesize):
+    def worker():
+        for phrase in phrases:
+            try:
+                synthesize(phrase)
+            except Exception as e:
+                print("⚠️ TTS cache warm-up failed:", e)
+    threading.Thread(target=worker, daemon=True).start()
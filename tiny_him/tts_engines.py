@@ -0,0 +1,207 @@
+import shutil
+import struct
+import subprocess
+import threading
+
+import numpy as np
+
+import config
+import models
+
+# Offline text-to-speech engines that stream PCM instead of writing a WAV.
+# speak() returns a SpeechStream as soon as the first chunk is rendered;
+# iterating it yields int16 mono chunks at .samplerate while the engine keeps
+# going, so playback starts long before the sentence is fully synthesized.
+#
+#   espeak  espeak-ng (or espeak) writing WAV to a stdout pipe
+#   piper   piper-tts neural voice (ONNX), kept resident by the model manager
+
+class SpeechStream:
+    def __init__(self, name, chunks, samplerate, on_close=None):
+        self.name = name
+        self.samplerate = samplerate
+        self.on_complete = None     # called with all the PCM once fully played
+        self.closed = False
+        self._chunks = chunks
+        self._on_close = on_close
+        # Rendering the first chunk here surfaces engine errors in speak()
+        self._first = next(chunks, None)
+        if self._first is None:
+            raise RuntimeError(f"{name} produced no audio")
+
+    def __str__(self):
+        return f"{self.name} stream ({self.samplerate} Hz)"
+
+    def __iter__(self):
+        kept = []
+        try:
+            if self.closed:
+                return
+            if self._first is not None:
+                first, self._first = self._first, None
+                kept.append(first)
+                yield first
+            for chunk in self._chunks:
+                if self.closed:
+                    return
+                kept.append(chunk)
+                yield chunk
+            if self.on_complete and not self.closed:
+                self.on_complete(np.concatenate(kept))
+        finally:
+            if self.closed:
+                self._release()
+
+    def close(self):
+        # Safe from another thread (barge-in): the engine stops and iteration ends
+        self.closed = True
+        if self._on_close:
+            self._on_close()
+        self._release()
+
+    def _release(self):
+        # Runs the engine's cleanup (its process, the pinned voice). While
+        # another thread is inside next(), that thread's __iter__ does it once
+        # on_close has made the engine return.
+        try:
+            self._chunks.close()
+        except ValueError:
+            pass
+
+class EspeakEngine:
+    name = "espeak"
+
+    def __init__(self, voice=None, rate=None):
+        self.binary = shutil.which("espeak-ng") or shutil.which("espeak") or "espeak"
+        self.voice = voice
+        self.rate = rate
+
+    def _read_header(self, out):
+        # espeak's streamed WAV header has placeholder sizes; only the format matters
+        if out.read(12)[:4] != b"RIFF":
+            return None
+        samplerate = None
+        while True:
+            chunk = out.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if chunk_id == b"data":
+                return samplerate
+            body = out.read(size)
+            if chunk_id == b"fmt ":
+                samplerate = struct.unpack("<I", body[4:8])[0]
+
+    def speak(self, text):
+        cmd = [self.binary, "--stdout"]
+        if self.voice:
+            cmd += ["-v", self.voice]
+        if self.rate:
+            cmd += ["-s", str(self.rate)]
+        # Text goes in on stdin so a reply starting with "-" isn't read as an option
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        proc.stdin.write(text.encode("utf-8"))
+        proc.stdin.close()
+        samplerate = self._read_header(proc.stdout)
+        if samplerate is None:
+            proc.kill()
+            proc.wait()
+            raise RuntimeError(f"{self.binary} exited with {proc.returncode}")
+
+        def chunks():
+            try:
+                while True:
+                    data = proc.stdout.read(config.LOCAL_TTS_CHUNK * 2)
+                    if len(data) < 2:
+                        break
+                    yield np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16)
+            finally:
+                proc.stdout.close()
+                if proc.poll() is None:
+                    proc.terminate()
+                proc.wait()
+
+        def stop():
+            if proc.poll() is None:
+                proc.terminate()
+            proc.wait()
+
+        return SpeechStream(self.name, chunks(), samplerate, on_close=stop)
+
+class PiperEngine:
+    name = "piper"
+
+    def speak(self, text):
+        stop = threading.Event()
+
+        def chunks():
+            # The voice stays pinned until the generator finishes or is closed
+            with models.use("tts") as voice:
+                if hasattr(voice, "synthesize_stream_raw"):
+                    # piper-tts < 1.3: raw int16 bytes, one sentence at a time
+                    rendered = (np.frombuffer(data, dtype=np.int16) for data in voice.synthesize_stream_raw(text, sentence_silence=0.0))
+                else:
+                    rendered = (chunk.audio_int16_array.reshape(-1) for chunk in voice.synthesize(text))
+                for chunk in rendered:
+                    if stop.is_set():
+                        return
+                    yield chunk
+
+        return SpeechStream(self.name, chunks(), get_samplerate(), on_close=stop.set)
+
+def _load_piper():
+    from piper import PiperVoice
+    print(f"🔍 Loading Piper voice {config.LOCAL_TTS_PIPER_MODEL}")
+    return PiperVoice.load(config.LOCAL_TTS_PIPER_MODEL)
+
+def get_samplerate():
+    return models.get("tts").config.sample_rate
+
+ENGINES = {
+    EspeakEngine.name: EspeakEngine,
+    PiperEngine.name: PiperEngine,
+}
+
+_engine = None
+
+def get_engine():
+    # The configured engine; espeak when the neural voice isn't installed
+    global _engine
+    if _engine is None:
+        name = config.LOCAL_TTS_ENGINE
+        if name not in ENGINES:
+            raise ValueError(f"Unknown TTS engine {name!r}, expected one of {', '.join(ENGINES)}")
+        if name == PiperEngine.name:
+            try:
+                import piper
+            except ImportError:
+                print("⚠️ piper-tts not installed, falling back to espeak")
+                name = EspeakEngine.name
+        if name == PiperEngine.name:
+            # ONNX weights are roughly their file size in memory, plus the runtime
+            models.register("tts", _load_piper, estimate_mb=100)
+            _engine = PiperEngine()
+        else:
+            _engine = EspeakEngine(config.LOCAL_TTS_VOICE, config.LOCAL_TTS_RATE)
+    return _engine
+
+def voice_id():
+    # Distinguishes cached clips of different voices
+    engine = get_engine()
+    if engine.name == PiperEngine.name:
+        return config.LOCAL_TTS_PIPER_MODEL
+    return "/".join(str(v) for v in (config.LOCAL_TTS_VOICE, config.LOCAL_TTS_RATE) if v) or None
+
+def speak(text):
+    return get_engine().speak(text)
+
+def buffered(text):
+    # The whole clip rendered into memory, as a single-chunk SpeechStream
+    stream = speak(text)
+    return SpeechStream(stream.name, iter([np.concatenate(list(stream))]), stream.samplerate)
+
+def render(text, path):
+    # Whole clip to a WAV file, for the TTS cache warm-up and LOCAL_TTS_STREAM off
+    from capture import save_wav
+    stream = speak(text)
+    return save_wav(np.concatenate(list(stream)), stream.samplerate, path)
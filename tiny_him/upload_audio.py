@@ -0,0 +1,95 @@
+import io
+import time
+import wave
+
+import numpy as np
+
+import config
+import metrics
+from capture import WHISPER_SAMPLERATE, to_mono_float32, wav_bytes
+from vad import energy_vad
+
+# Shrinks audio before it goes to the cloud STT. Whisper only ever looks at
+# 16 kHz mono, so a 44.1 kHz stereo arecord WAV (~176 KB per second) is
+# downmixed and resampled, leading and trailing silence is cut, and the rest
+# is encoded as FLAC (lossless, roughly half of 16-bit PCM) or Opus (far
+# smaller, lossy but fine for speech). Anything that can't be decoded or
+# encoded goes up as it is.
+
+FORMATS = {
+    # name -> (soundfile format, subtype, file extension)
+    "flac": ("FLAC", "PCM_16", ".flac"),
+    "opus": ("OGG", "OPUS", ".ogg"),
+    "wav": ("WAV", "PCM_16", ".wav"),
+}
+
+def _read_wav(path):
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        with wave.open(io.BytesIO(raw), "rb") as w:
+            if w.getsampwidth() != 2:
+                return raw, None, None
+            pcm = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16).reshape(-1, w.getnchannels())
+            return raw, pcm, w.getframerate()
+    except (wave.Error, EOFError):
+        return raw, None, None
+
+def trim_silence(audio, samplerate, pad_ms=200):
+    # Cuts everything before the first and after the last speech frame, keeping
+    # pad_ms either side. Audio without any detected speech is left whole.
+    frame_len = int(samplerate * config.VAD_FRAME_MS / 1000)
+    n_frames = len(audio) // frame_len
+    if not n_frames:
+        return audio
+    vad = energy_vad(config)
+    speech = np.flatnonzero(vad.is_speech(audio[:n_frames * frame_len].reshape(n_frames, frame_len)))
+    if not len(speech):
+        return audio
+    pad = int(samplerate * pad_ms / 1000)
+    start = max(0, speech[0] * frame_len - pad)
+    end = min(len(audio), (speech[-1] + 1) * frame_len + pad)
+    return audio[start:end]
+
+def encode(audio, samplerate, fmt):
+    file_format, subtype, ext = FORMATS[fmt]
+    if fmt == "wav":
+        return "input.wav", wav_bytes((np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16), samplerate)
+    import soundfile as sf
+    buf = io.BytesIO()
+    sf.write(buf, audio, samplerate, format=file_format, subtype=subtype)
+    return "input" + ext, buf.getvalue()
+
+def prepare(audio, samplerate=16000):
+    # audio is a WAV path or int16 PCM from the capture. Returns (filename,
+    # bytes, raw_bytes), raw_bytes being what the plain WAV upload would be.
+    if isinstance(audio, str):
+        raw, pcm, rate = _read_wav(audio)
+        raw_bytes = len(raw)
+        if pcm is None:
+            return "input.wav", raw, raw_bytes
+    else:
+        raw, pcm, rate = None, audio, samplerate
+        raw_bytes = pcm.nbytes + 44
+
+    if not config.UPLOAD_PREPROCESS:
+        return "input.wav", raw if raw is not None else wav_bytes(pcm, rate), raw_bytes
+
+    start = time.perf_counter()
+    mono = to_mono_float32(pcm, rate)
+    speech = trim_silence(mono, WHISPER_SAMPLERATE, config.UPLOAD_TRIM_PAD_MS) if config.UPLOAD_TRIM_SILENCE else mono
+    try:
+        name, data = encode(speech, WHISPER_SAMPLERATE, config.UPLOAD_FORMAT)
+    except Exception as e:
+        print(f"⚠️ Could not encode {config.UPLOAD_FORMAT} upload, sending WAV:", e)
+        name, data = encode(speech, WHISPER_SAMPLERATE, "wav")
+    metrics.record("encode", time.perf_counter() - start, "online")
+    metrics.note(
+        "upload",
+        raw_bytes=raw_bytes,
+        sent_bytes=len(data),
+        trimmed_s=round((len(mono) - len(speech)) / WHISPER_SAMPLERATE, 2),
+        format=name.rsplit(".", 1)[1]
+    )
+    metrics.increment("upload_bytes_saved", max(0, raw_bytes - len(data)))
+    return name, data, raw_bytes
@@ -0,0 +1,112 @@
+import numpy as np
+
+class EnergyVAD:
+    # Per-frame RMS energy + zero-crossing rate, computed for a whole block of
+    # frames at once. The threshold follows an estimate of the noise floor so a
+    # noisy room doesn't count as speech.
+
+    def __init__(self, energy_threshold=0.01, zcr_max=0.35, noise_ratio=3.0, calibration_frames=10, max_noise_floor=0.02):
+        self.energy_threshold = energy_threshold
+        self.zcr_max = zcr_max
+        self.noise_ratio = noise_ratio
+        self.calibration_frames = calibration_frames
+        self.max_noise_floor = max_noise_floor
+        self.noise_floor = None
+        self._calibration = []
+
+    def is_speech(self, frames):
+        # frames: float32 array of shape (n_frames, frame_len) in [-1, 1]
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        if self.noise_floor is None:
+            # Seeded from a low percentile of the first calibration_frames, so a
+            # click or a word right at the start doesn't become the floor
+            self._calibration.extend(rms.tolist())
+            floor = float(np.percentile(self._calibration, 10)) if self._calibration else 0.0
+            # Clamped, or a floor seeded during speech would put speech out of reach
+            floor = min(floor, self.max_noise_floor)
+            if len(self._calibration) >= self.calibration_frames:
+                self.noise_floor, self._calibration = floor, []
+        else:
+            floor = self.noise_floor
+        threshold = max(self.energy_threshold, floor * self.noise_ratio)
+        speech = (rms > threshold) & (zcr < self.zcr_max)
+
+        # Only frames under the energy threshold adapt the floor: loud frames
+        # rejected by the ZCR test are usually missed speech (fricatives)
+        quiet = rms[rms <= threshold]
+        if self.noise_floor is not None and len(quiet):
+            self.noise_floor = min(0.95 * self.noise_floor + 0.05 * float(np.median(quiet)), self.max_noise_floor)
+        return speech
+
+class WebRTCVAD:
+    def __init__(self, samplerate, aggressiveness=2):
+        import webrtcvad
+        self.samplerate = samplerate
+        self.vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frames):
+        pcm = (np.clip(frames, -1.0, 1.0) * 32767).astype(np.int16)
+        return np.array([self.vad.is_speech(f.tobytes(), self.samplerate) for f in pcm], dtype=bool)
+
+def energy_vad(config):
+    return EnergyVAD(
+        config.VAD_ENERGY_THRESHOLD,
+        config.VAD_ZCR_MAX,
+        calibration_frames=max(1, config.VAD_CALIBRATION_MS // config.VAD_FRAME_MS),
+        max_noise_floor=config.VAD_NOISE_FLOOR_MAX
+    )
+
+def load_vad(config):
+    if config.VAD_BACKEND == "webrtc":
+        return WebRTCVAD(config.CAPTURE_SAMPLERATE, config.VAD_WEBRTC_AGGRESSIVENESS)
+    return energy_vad(config)
+
+class Endpointer:
+    # Fed with raw int16 capture blocks; reports when speech has been followed
+    # by hangover_ms of silence, or when nobody spoke within no_speech_timeout.
+
+    def __init__(self, vad, samplerate, frame_ms=30, hangover_ms=800, min_speech_ms=250, no_speech_timeout=5.0):
+        self.vad = vad
+        self.frame_len = int(samplerate * frame_ms / 1000)
+        self.hangover_frames = int(hangover_ms / frame_ms)
+        self.min_speech_frames = max(1, int(min_speech_ms / frame_ms))
+        self.timeout_frames = int(no_speech_timeout * 1000 / frame_ms)
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.frames_seen = 0
+        self.speech_frames = 0
+        self.silence_run = 0
+        self.done = False
+
+    @property
+    def speech_detected(self):
+        return self.speech_frames >= self.min_speech_frames
+
+    def feed(self, pcm):
+        if self.done or not len(pcm):
+            return self.done
+        mono = pcm.astype(np.float32) / 32768.0
+        if mono.ndim == 2:
+            mono = mono.mean(axis=1)
+        samples = np.concatenate((self.pending, mono))
+        n = len(samples) // self.frame_len
+        self.pending = samples[n * self.frame_len:]
+        if n == 0:
+            return False
+
+        for speech in self.vad.is_speech(samples[:n * self.frame_len].reshape(n, self.frame_len)):
+            self.frames_seen += 1
+            if speech:
+                self.speech_frames += 1
+                self.silence_run = 0
+            else:
+                self.silence_run += 1
+            if self.speech_detected and self.silence_run >= self.hangover_frames:
+                self.done = True
+                break
+            if not self.speech_detected and self.frames_seen >= self.timeout_frames:
+                self.done = True
+                break
+        return self.done